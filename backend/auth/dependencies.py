@@ -1,14 +1,28 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from models.user import User, TokenData
-from auth.jwt_handler import get_current_user as get_current_token
+from auth.jwt_handler import (
+    get_current_user as get_current_token, decode_access_token, optional_security
+)
 from services.user_service import user_service
 
+async def _resolve_user(token_data: TokenData) -> Optional[User]:
+    if token_data.user_id:
+        return await user_service.get_user_by_id(token_data.user_id)
+    # Tokens issued before the user id was embedded only carry the email
+    return await user_service.get_user_by_email(token_data.email)
+
+
 async def get_current_user(token_data: TokenData = Depends(get_current_token)) -> User:
     """
     Dependency that retrieves the full User object from the database 
     based on the JWT token.
+    
+    FastAPI resolves a dependency once per request, so routes and controllers
+    should take the user from here rather than looking it up again.
     """
-    user = await user_service.get_user_by_email(token_data.email)
+    user = await _resolve_user(token_data)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -16,3 +30,19 @@ async def get_current_user(token_data: TokenData = Depends(get_current_token)) -
             headers={"WWW-Authenticate": "Bearer"},
         )
     return user
+
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[User]:
+    """
+    Like get_current_user, but returns None for anonymous requests instead
+    of rejecting them. An invalid or expired token is treated as anonymous.
+    """
+    if credentials is None:
+        return None
+    try:
+        token_data = decode_access_token(credentials.credentials)
+    except HTTPException:
+        return None
+    return await _resolve_user(token_data)
@@ -1,26 +1,52 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config.settings import settings
-from models.user import TokenData
+from models.user import TokenData, User
+from utils.concurrency import BoundedExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
+# bcrypt is deliberately slow and releases the GIL, so hashing runs on a
+# small thread pool instead of blocking the event loop
+password_executor = BoundedExecutor(
+    "bcrypt",
+    max_in_flight=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
     # Truncate to 72 bytes to match the hashing logic
-    return pwd_context.verify(plain_password[:72], hashed_password)
+    return await password_executor.run(pwd_context.verify, plain_password[:72], hashed_password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if it was hashed with outdated settings.
+    
+    Returns (is_valid, new_hash); new_hash is None unless the stored hash
+    should be replaced, e.g. after BCRYPT_ROUNDS changed.
+    """
+    return await password_executor.run(pwd_context.verify_and_update, plain_password[:72], hashed_password)
 
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Hash a password."""
     # Truncate password to 72 bytes to prevent issues with bcrypt
-    return pwd_context.hash(password[:72])
+    return await password_executor.run(pwd_context.hash, password[:72])
+
+
+def user_token_claims(user: User) -> dict:
+    """Claims identifying a user, so requests can resolve them by primary key."""
+    return {"sub": user.email, "uid": user.id, "username": user.username}
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -36,8 +62,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
-    """Verify JWT token and return current user data."""
+def decode_access_token(token: str) -> TokenData:
+    """Decode a JWT access token, raising 401 if it is invalid or expired."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,13 +71,21 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            username=payload.get("username")
+        )
     except JWTError:
         raise credentials_exception
     
     return token_data
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
+    """Verify JWT token and return current user data."""
+    return decode_access_token(credentials.credentials)
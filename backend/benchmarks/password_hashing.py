@@ -0,0 +1,73 @@
+"""
+Benchmark login throughput for different bcrypt costs and hashing pool sizes.
+
+Each run verifies a batch of concurrent logins through the same
+BoundedExecutor the API uses, and records how long the event loop was stalled
+while they ran.
+
+Usage (from the backend directory):
+    python -m benchmarks.password_hashing --rounds 10 12 --workers 1 2 4 --logins 64
+"""
+import argparse
+import asyncio
+import time
+from passlib.context import CryptContext
+from utils.concurrency import BoundedExecutor
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the worst delay seen between scheduled event loop ticks."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_logins(rounds: int, workers: int, logins: int) -> dict:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    hashed = context.hash("correct horse battery staple")
+    executor = BoundedExecutor("bench", max_in_flight=workers, max_queue=logins)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            executor.run(context.verify, "correct horse battery staple", hashed)
+            for _ in range(logins)
+        ))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        executor.shutdown()
+
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins_per_sec": logins / elapsed,
+        "ms_per_login": elapsed / logins * 1000,
+        "max_loop_lag_ms": await lag_task * 1000,
+    }
+
+
+async def main(rounds_list, workers_list, logins: int) -> None:
+    print(f"{'rounds':>6} {'workers':>7} {'logins/s':>9} {'ms/login':>9} {'loop lag ms':>12}")
+    for rounds in rounds_list:
+        for workers in workers_list:
+            result = await run_logins(rounds, workers, logins)
+            print(
+                f"{result['rounds']:>6} {result['workers']:>7} "
+                f"{result['logins_per_sec']:>9.1f} {result['ms_per_login']:>9.1f} "
+                f"{result['max_loop_lag_ms']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.workers, args.logins))
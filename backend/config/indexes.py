@@ -0,0 +1,168 @@
+"""
+Index definitions for every collection, plus a check that the queries issued
+by the services are served by an index.
+
+Indexes are created on startup from the main.py lifespan. The check can be
+run on startup (INDEX_CHECK_ON_STARTUP) or from the command line:
+
+    python -m config.indexes --check
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+from utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "outfit_analyses": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("image_filename", ASCENDING)]),
+        # Incremental refreshes of the similarity corpora
+        IndexModel([("updated_at", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)]),
+    ],
+    "outfit_comments": [
+        IndexModel([("analysis_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "closet": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("color", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("tags", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Search is always within one user's closet, so user_id prefixes the text index
+        IndexModel(
+            [("user_id", ASCENDING), ("name", TEXT), ("description", TEXT), ("tags", TEXT)],
+            weights={"name": 10, "tags": 5, "description": 1},
+            name="closet_text"
+        ),
+    ],
+    "analysis_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "analysis_jobs": [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+        IndexModel([("image_filename", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "storage_deletions": [
+        IndexModel([("available_at", ASCENDING)]),
+    ],
+}
+
+
+_SAMPLE_CURSOR = encode_cursor(datetime(2024, 1, 1), "507f1f77bcf86cd799439011")
+
+# Representative shape of every query the services run:
+# (description, collection, filter, sort)
+QUERY_PLANS: List[Tuple[str, str, Dict[str, Any], List[Tuple[str, int]]]] = [
+    ("user by email", "users", {"email": "user@example.com"}, []),
+    ("user by username", "users", {"username": "johndoe"}, []),
+    ("user analyses", "outfit_analyses", {"user_id": "507f1f77bcf86cd799439012"}, KEYSET_SORT),
+    ("community feed", "outfit_analyses", {"is_public": True}, KEYSET_SORT),
+    ("community feed page", "outfit_analyses", {"is_public": True, **keyset_filter(_SAMPLE_CURSOR)}, KEYSET_SORT),
+    ("analysis comments", "outfit_comments", {"analysis_id": "507f1f77bcf86cd799439011"}, KEYSET_SORT),
+    ("analysis comments page", "outfit_comments", {
+        "analysis_id": "507f1f77bcf86cd799439011", **keyset_filter(_SAMPLE_CURSOR)
+    }, KEYSET_SORT),
+    ("user closet", "closet", {"user_id": "507f1f77bcf86cd799439012"}, KEYSET_SORT),
+    ("user closet page", "closet", {"user_id": "507f1f77bcf86cd799439012", **keyset_filter(_SAMPLE_CURSOR)}, KEYSET_SORT),
+    ("closet by category", "closet", {"user_id": "507f1f77bcf86cd799439012", "category": "top"}, KEYSET_SORT),
+    ("closet by color", "closet", {"user_id": "507f1f77bcf86cd799439012", "color": "navy"}, KEYSET_SORT),
+    ("closet search", "closet", {"user_id": "507f1f77bcf86cd799439012", "$text": {"$search": "navy wool"}}, []),
+    ("closet by tags", "closet", {"user_id": "507f1f77bcf86cd799439012", "tags": {"$all": ["casual", "summer"]}}, KEYSET_SORT),
+    ("claim analysis job", "analysis_jobs", {
+        "$or": [
+            {"status": "queued", "available_at": {"$lte": datetime(2024, 1, 1)}},
+            {"status": "running", "lease_expires_at": {"$lt": datetime(2024, 1, 1)}},
+        ]
+    }, [("available_at", 1)]),
+    ("claim upload deletion", "storage_deletions", {"available_at": {"$lte": datetime(2024, 1, 1)}}, [("available_at", 1)]),
+    ("analyses using uploads", "outfit_analyses", {"image_filename": {"$in": ["ab.jpg", "ab.png"]}}, []),
+    ("user similarity corpus", "outfit_analyses", {
+        "user_id": "507f1f77bcf86cd799439012", "features.version": 1
+    }, []),
+    ("public similarity corpus", "outfit_analyses", {"is_public": True, "features.version": 1}, []),
+    ("user similarity corpus changes", "outfit_analyses", {
+        "user_id": "507f1f77bcf86cd799439012", "updated_at": {"$gt": datetime(2024, 1, 1)}
+    }, []),
+    ("public similarity corpus changes", "outfit_analyses", {"updated_at": {"$gt": datetime(2024, 1, 1)}}, []),
+    ("jobs using uploads", "analysis_jobs", {
+        "image_filename": {"$in": ["ab.jpg", "ab.png"]}, "status": {"$nin": ["succeeded", "failed"]}
+    }, []),
+]
+
+
+async def ensure_indexes() -> None:
+    """Create all declared indexes; existing ones are left untouched."""
+    db = await get_database()
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate data blocking a unique index; keep serving
+            print(f"Could not create indexes on {collection}: {e}")
+
+
+def _collection_scans(plan: Any) -> List[str]:
+    """Collect the stages of an explain plan that scan a whole collection."""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _collection_scans(item)]
+    if not isinstance(plan, dict):
+        return []
+
+    found = [plan["stage"]] if plan.get("stage") == "COLLSCAN" else []
+    for value in plan.values():
+        found.extend(_collection_scans(value))
+    return found
+
+
+async def check_query_plans() -> List[str]:
+    """
+    Explain every service query and return the ones planned as a COLLSCAN.
+    """
+    db = await get_database()
+    failures = []
+    for description, collection, query, sort in QUERY_PLANS:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        if _collection_scans(explanation.get("queryPlanner", {}).get("winningPlan")):
+            failures.append(f"{description} ({collection}: {query})")
+    return failures
+
+
+async def verify_indexes() -> None:
+    """Raise if any service query would scan a whole collection."""
+    failures = await check_query_plans()
+    if failures:
+        raise RuntimeError("Queries without a supporting index: " + "; ".join(failures))
+
+
+async def _main(check: bool) -> int:
+    await connect_to_mongo()
+    try:
+        await ensure_indexes()
+        if not check:
+            return 0
+        failures = await check_query_plans()
+        for failure in failures:
+            print(f"COLLSCAN: {failure}")
+        print(f"{len(QUERY_PLANS) - len(failures)}/{len(QUERY_PLANS)} queries use an index")
+        return 1 if failures else 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--check" in sys.argv)))
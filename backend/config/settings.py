@@ -1,24 +1,97 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "outfit_analyzer"
+    INDEX_CHECK_ON_STARTUP: bool = False
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+    
+    # Authenticated user lookup cache
+    USER_CACHE_MAX_ENTRIES: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 30
+    
     # Gemini API
     GEMINI_API_KEY: str
+    GEMINI_MAX_IN_FLIGHT: int = 4
+    GEMINI_MAX_QUEUE: int = 16
+    GEMINI_TIMEOUT_SECONDS: float = 60.0
+    GEMINI_STREAM_TIMEOUT_SECONDS: float = 120.0
+    GEMINI_STRUCTURED_OUTPUT: bool = True
+    GEMINI_OUTPUT_RETRIES: int = 1
+    
+    # Gemini retries, circuit breaker and hedged requests
+    GEMINI_RETRY_MAX_ATTEMPTS: int = 3
+    GEMINI_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    GEMINI_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20
+    GEMINI_LATENCY_WINDOW: int = 200
+    
+    # Analysis cache
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 512
+    ANALYSIS_CACHE_MEMORY_TTL_SECONDS: int = 3600  # 1 hour
+    ANALYSIS_CACHE_TTL_SECONDS: int = 604800  # 7 days
+    
+    # Community feed page cache
+    FEED_CACHE_PAGES: int = 5
+    FEED_CACHE_MAX_ENTRIES: int = 64
+    FEED_CACHE_TTL_SECONDS: float = 5.0
+
+    # Background analysis jobs
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_LEASE_SECONDS: int = 180
+    JOB_RETRY_BACKOFF_SECONDS: int = 5
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_RETENTION_SECONDS: int = 86400  # 1 day
+    
+    # Batch analysis
+    BATCH_ANALYZE_MAX_FILES: int = 30
+    BATCH_ANALYZE_PARALLELISM: int = 4
+    BATCH_INSERT_MAX_SIZE: int = 10
+    
+    # Closet bulk operations and imports
+    CLOSET_BULK_MAX_ITEMS: int = 500
+    CLOSET_IMPORT_BATCH_SIZE: int = 200
+    CLOSET_IMPORT_MAX_LINE_BYTES: int = 16384
+    CLOSET_IMPORT_MAX_ERRORS: int = 100
+    
+    # Closet facet counts cache
+    CLOSET_FACETS_CACHE_MAX_ENTRIES: int = 1024
+    CLOSET_FACETS_CACHE_TTL_SECONDS: int = 300
+    CLOSET_FACET_TAG_LIMIT: int = 50
+    
+    # Similar outfits
+    SIMILARITY_REFRESH_SECONDS: int = 5
+    SIMILARITY_FULL_REFRESH_SECONDS: int = 900
+    SIMILARITY_MAX_CORPORA: int = 256
+    SIMILARITY_DUPLICATE_MAX_DISTANCE: int = 6
     
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Response compression
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     
@@ -27,6 +100,37 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 5242880  # 5MB
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png"
     
+    # Upload storage ("local" or "s3")
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. http://minio:9000
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PUBLIC_URL: Optional[str] = None
+    S3_KEY_PREFIX: str = ""  # e.g. uploads/, to share the bucket
+    STORAGE_MAX_IN_FLIGHT: int = 8
+    STORAGE_MAX_QUEUE: int = 64
+    STORAGE_TIMEOUT_SECONDS: float = 60.0
+    
+    # Upload cleanup
+    STORAGE_DELETE_MAX_ATTEMPTS: int = 5
+    STORAGE_DELETE_LEASE_SECONDS: int = 300
+    STORAGE_DELETE_RETRY_BACKOFF_SECONDS: int = 30
+    STORAGE_DELETE_POLL_INTERVAL_SECONDS: float = 10.0
+    STORAGE_RECONCILE_INTERVAL_SECONDS: int = 21600  # 6 hours; 0 disables
+    STORAGE_ORPHAN_GRACE_SECONDS: int = 86400  # 1 day
+    
+    # Image processing
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_QUEUE: int = 32
+    IMAGE_TIMEOUT_SECONDS: float = 30.0
+    MODEL_IMAGE_MAX_EDGE: int = 1024
+    MODEL_IMAGE_QUALITY: int = 85
+    IMAGE_THUMB_EDGE: int = 480
+    IMAGE_MEDIUM_EDGE: int = 960
+    IMAGE_VARIANT_QUALITY: int = 80
+    
     @property
     def origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
@@ -2,7 +2,8 @@ from fastapi import HTTPException, status
 from datetime import timedelta
 from models.user import UserCreate, UserLogin, Token, User
 from services.user_service import user_service
-from auth.jwt_handler import verify_password, create_access_token
+from auth.jwt_handler import verify_and_update_password, create_access_token, user_token_claims
+from utils.concurrency import ExecutorBusyError, ExecutorTimeoutError
 from config.settings import settings
 
 
@@ -17,7 +18,7 @@ class AuthController:
             # Create access token
             access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
             access_token = create_access_token(
-                data={"sub": user.email}, 
+                data=user_token_claims(user), 
                 expires_delta=access_token_expires
             )
             
@@ -39,6 +40,12 @@ class AuthController:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(e)
             )
+        except (ExecutorBusyError, ExecutorTimeoutError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many signups in progress. Please try again shortly.",
+                headers={"Retry-After": "1"}
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -58,16 +65,29 @@ class AuthController:
             )
         
         # Verify password
-        if not verify_password(login_data.password, user.hashed_password):
+        try:
+            is_valid, new_hash = await verify_and_update_password(login_data.password, user.hashed_password)
+        except (ExecutorBusyError, ExecutorTimeoutError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts in progress. Please try again shortly.",
+                headers={"Retry-After": "1"}
+            )
+        
+        if not is_valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
         
+        # Transparently upgrade hashes created with an older cost setting
+        if new_hash:
+            await user_service.update_password_hash(user, new_hash)
+        
         # Create access token
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, 
+            data=user_token_claims(user), 
             expires_delta=access_token_expires
         )
         
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from models.closet import ClosetItem, ClosetItemCreate, ClosetItemUpdate
-from services.closet_service import ClosetService
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from typing import List, Literal, Optional
+from models.closet import (
+    ClosetBulkDelete, ClosetBulkRequest, ClosetBulkResult, ClosetFacets, ClosetFilter, ClosetImportResult,
+    ClosetItem, ClosetItemCreate, ClosetItemUpdate, ClosetPage
+)
+from services.closet_service import ClosetService, IMPORT_FORMATS
 from auth.dependencies import get_current_user
+from config.settings import settings
 from models.user import User
+from utils.http_cache import check_not_modified, version_etag
+from utils.streaming import iter_lines
 
 router = APIRouter()
 
@@ -15,10 +21,137 @@ async def add_item_to_closet(
     """Add a new item to the user's virtual closet."""
     return await ClosetService.create_item(str(current_user.id), item)
 
-@router.get("/", response_model=List[ClosetItem])
-async def get_my_closet(current_user: User = Depends(get_current_user)):
-    """Retrieve all items in the user's closet."""
-    return await ClosetService.get_user_closet(str(current_user.id))
+@router.get("/", response_model=ClosetPage)
+async def get_my_closet(
+    response: Response,
+    category: Optional[str] = Query(None),
+    color: Optional[str] = Query(None),
+    tags: Optional[List[str]] = Query(None),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    view: Literal["full", "grid"] = Query("full"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retrieve a page of the user's closet, newest first.
+    
+    - **category**, **color**: Only items with exactly this value
+    - **tags**: Only items carrying all of these tags (repeat the parameter)
+    - **cursor**: `next_cursor` from the previous page
+    - **view**: `grid` returns only the fields shown in the closet grid
+    
+    The ETag is built from the page's ids and updated_at; a matching
+    If-None-Match gets a 304 without the items being loaded.
+    """
+    closet_filter = ClosetFilter(category=category, color=color, tags=tags)
+    user_id = str(current_user.id)
+    try:
+        versions = await ClosetService.get_user_closet_versions(user_id, closet_filter, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    etag = version_etag("closet", closet_filter.model_dump(), limit, cursor, view, versions)
+    not_modified = check_not_modified(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
+    
+    items, next_cursor = await ClosetService.get_user_closet(user_id, closet_filter, limit, cursor, view)
+    return ClosetPage(items=items, next_cursor=next_cursor)
+
+@router.get("/search", response_model=ClosetPage)
+async def search_closet(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    view: Literal["full", "grid"] = Query("full"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search the user's closet by name, description and tags, best matches first.
+    
+    - **q**: Words to look for, e.g. `navy wool`; wrap a phrase in quotes to
+      require it and prefix a word with `-` to exclude it
+    """
+    items = await ClosetService.search_items(str(current_user.id), q, limit, skip, view)
+    return ClosetPage(items=items)
+
+@router.get("/facets", response_model=ClosetFacets)
+async def get_closet_facets(current_user: User = Depends(get_current_user)):
+    """Count the user's items per category, color and tag."""
+    return await ClosetService.get_facets(str(current_user.id))
+
+def _check_bulk_size(count: int) -> None:
+    if count > settings.CLOSET_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many items. Maximum per request: {settings.CLOSET_BULK_MAX_ITEMS}"
+        )
+
+@router.post("/bulk", response_model=ClosetBulkResult)
+async def add_items_to_closet(
+    request: ClosetBulkRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add many items at once.
+    
+    Items are validated one by one; invalid ones are listed in `errors` by
+    their position in `items` and the rest are still created.
+    """
+    _check_bulk_size(len(request.items))
+    return await ClosetService.create_items(str(current_user.id), request.items)
+
+@router.patch("/bulk", response_model=ClosetBulkResult)
+async def update_closet_items(
+    request: ClosetBulkRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Update many items at once.
+    
+    Each entry holds the item's `id` plus the fields to change. Entries that
+    are invalid or name an unknown item are listed in `errors`.
+    """
+    _check_bulk_size(len(request.items))
+    return await ClosetService.update_items(str(current_user.id), request.items)
+
+@router.post("/bulk/delete", response_model=ClosetBulkResult)
+async def delete_closet_items(
+    request: ClosetBulkDelete,
+    current_user: User = Depends(get_current_user)
+):
+    """Remove many items at once; unknown ids are listed in `errors`."""
+    _check_bulk_size(len(request.ids))
+    return await ClosetService.delete_items(str(current_user.id), request.ids)
+
+@router.post("/import", response_model=ClosetImportResult)
+async def import_closet(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import items from a CSV (`text/csv`) or JSON-lines (`application/x-ndjson`) body.
+    
+    CSV needs a header row with at least `name`, `category` and `color`;
+    separate tags with `;`; quoted fields may contain line breaks. The body
+    is read and written in batches as it arrives, so files of any length can
+    be imported. Records that cannot be imported are reported by the number
+    of their first line and skipped.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    file_format = IMPORT_FORMATS.get(content_type)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type. Use one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    lines = iter_lines(request.stream(), settings.CLOSET_IMPORT_MAX_LINE_BYTES)
+    try:
+        return await ClosetService.import_items(str(current_user.id), lines, file_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/{item_id}", response_model=ClosetItem)
 async def get_closet_item(
@@ -1,30 +1,114 @@
-from fastapi import HTTPException, status, UploadFile
-from typing import List, Optional
-from models.outfit import OutfitAnalysis, OutfitAnalysisCreate, OutfitAnalysisResponse, Comment
+import asyncio
+import json
+import math
+from fastapi import HTTPException, Response, status, UploadFile
+from typing import AsyncIterator, List, Optional
+from models.outfit import OutfitAnalysis, OutfitAnalysisCreate, OutfitAnalysisResponse, SimilarOutfit
+from models.job import JOB_TERMINAL_STATUSES
+from models.user import User
+from config.settings import settings
 
 from services.outfit_service import outfit_service
-from services.gemini_service import gemini_service
-from services.user_service import user_service
-from utils.file_utils import validate_file, save_upload_file, get_file_path, delete_file
+from services.comment_service import comment_service
+from services.feed_cache import feed_cache
+from services.gemini_service import MODEL_UNAVAILABLE_ERRORS, gemini_service
+from services.analysis_service import analysis_service
+from services.job_service import job_service
+from services.similarity_service import PUBLIC_SCOPE, similarity_service
+from services.upload_service import upload_service
+from utils.file_utils import StoredUpload, UploadValidationError, image_urls_version
+from utils.concurrency import ExecutorBusyError
+from utils.resilience import CircuitOpenError, UpstreamUnavailableError
+from utils.http_cache import check_not_modified, etag_matches, json_bytes, make_etag, version_etag
+
+
+def _model_unavailable(e: Exception) -> HTTPException:
+    """Translate a rejected, failing or timed-out model call into an HTTP error."""
+    if isinstance(e, ExecutorBusyError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The AI stylist is busy right now. Please try again shortly.",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The AI stylist is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    if isinstance(e, UpstreamUnavailableError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The AI stylist is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": "10"}
+        )
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="The AI stylist took too long to respond. Please try again."
+    )
+
+
+def _batch_error(e: Exception) -> HTTPException:
+    """Translate the failure of one image in a batch into the error reported for it."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, MODEL_UNAVAILABLE_ERRORS):
+        return _model_unavailable(e)
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Error analyzing outfit: {str(e)}"
+    )
+
 
 class OutfitController:
     @staticmethod
-    async def get_community_feed(limit: int = 50, skip: int = 0) -> dict:
-        """Get the community feed."""
-        analyses = await outfit_service.get_community_feed(limit, skip)
-        return {
-            "success": True,
-            "data": analyses
-        }
+    async def get_community_feed(
+        limit: int = 50,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        user: Optional[User] = None,
+        if_none_match: Optional[str] = None
+    ) -> Response:
+        """
+        Get the community feed, with the signed-in user's reactions if any.
+        
+        Anonymous requests for the first pages are served from feed_cache.
+        Every response carries an ETag, and a matching If-None-Match gets an
+        empty 304.
+        """
+        async def build():
+            try:
+                analyses, next_cursor = await outfit_service.get_community_feed(
+                    limit, skip, cursor, viewer_id=user.id if user else None
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            body = json_bytes({
+                "success": True,
+                "data": analyses,
+                "next_cursor": next_cursor
+            })
+            return body, frozenset(analysis.id for analysis in analyses), next_cursor
+
+        depth = feed_cache.page_depth(limit, skip, cursor) if user is None else None
+        if depth is not None:
+            page = await feed_cache.get_page((limit, skip, cursor), depth, limit, build)
+            body, etag = page.body, page.etag
+        else:
+            body, _, _ = await build()
+            etag = make_etag(body)
+
+        # Clients must revalidate, and the body differs with and without a token
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Authorization"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
 
     @staticmethod
-    async def toggle_public_status(analysis_id: str, user_email: str, tags: List[str] = None) -> dict:
+    async def toggle_public_status(analysis_id: str, user: User, tags: List[str] = None) -> dict:
         """Toggle public status of an analysis."""
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
         new_status = await outfit_service.toggle_public(analysis_id, user.id, tags)
+        feed_cache.invalidate_all()
         return {
             "success": True,
             "message": "Visibility updated",
@@ -32,45 +116,45 @@ class OutfitController:
         }
 
     @staticmethod
-    async def toggle_like(analysis_id: str, user_email: str) -> dict:
+    async def toggle_like(analysis_id: str, user: User) -> dict:
         """Toggle like on an analysis."""
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        is_liked = await outfit_service.toggle_like(analysis_id, user.id)
+        state = await outfit_service.toggle_like(analysis_id, user.id)
+        if state is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
+        feed_cache.invalidate_analysis(analysis_id)
         return {
             "success": True,
-            "liked": is_liked
+            **state.model_dump()
         }
 
     @staticmethod
-    async def toggle_dislike(analysis_id: str, user_email: str) -> dict:
+    async def toggle_dislike(analysis_id: str, user: User) -> dict:
         """Toggle dislike on an analysis."""
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        is_disliked = await outfit_service.toggle_dislike(analysis_id, user.id)
+        state = await outfit_service.toggle_dislike(analysis_id, user.id)
+        if state is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
+        feed_cache.invalidate_analysis(analysis_id)
         return {
             "success": True,
-            "disliked": is_disliked
+            **state.model_dump()
         }
 
     @staticmethod
-    async def add_comment(analysis_id: str, user_email: str, text: str) -> dict:
+    async def add_comment(analysis_id: str, user: User, text: str) -> dict:
         """Add a comment to an analysis."""
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        comment = Comment(
-            user_id=user.id,
-            username=user.username,
-            text=text
-        )
-        
-        await outfit_service.add_comment(analysis_id, comment.model_dump())
+        comment = await comment_service.add_comment(analysis_id, user.id, user.username, text)
+        if comment is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
+        feed_cache.invalidate_analysis(analysis_id)
         return {
             "success": True,
             "message": "Comment added",
@@ -81,44 +165,29 @@ class OutfitController:
 
 
     @staticmethod
-    async def analyze_outfit(file: UploadFile, user_email: str, occasion: Optional[str] = None, weather: Optional[str] = None) -> dict:
+    async def _store_upload(file: UploadFile) -> StoredUpload:
+        """
+        Validate and store an uploaded file in a single streaming pass, along
+        with its thumbnail and medium derivatives.
+        """
+        try:
+            return await upload_service.store(file)
+        except UploadValidationError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    @staticmethod
+    async def analyze_outfit(file: UploadFile, user: User, occasion: Optional[str] = None, weather: Optional[str] = None) -> dict:
         """
         Analyze outfit from uploaded image.
         """
         try:
-            # Validate file
-            is_valid, error_msg = await validate_file(file)
-            if not is_valid:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=error_msg
-                )
-            
-            # Get user
-            user = await user_service.get_user_by_email(user_email)
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found"
-                )
-            
-            # Save uploaded file
-            filename = await save_upload_file(file)
-            file_path = get_file_path(filename)
+            upload = await OutfitController._store_upload(file)
             
             try:
-                # Analyze outfit using Gemini
-                analysis_result = await gemini_service.analyze_outfit(file_path, occasion, weather)
-                
-                # Save analysis to database
-                analysis_data = OutfitAnalysisCreate(
-                    user_id=user.id,
-                    image_filename=filename,
-                    analysis_result=analysis_result
+                saved_analysis = await analysis_service.analyze_and_store(
+                    user.id, upload.filename, upload.digest, occasion, weather, upload.variants
                 )
                 
-                saved_analysis = await outfit_service.create_analysis(analysis_data)
-                
                 return {
                     "success": True,
                     "message": "Outfit analyzed successfully",
@@ -127,11 +196,13 @@ class OutfitController:
                 
             except Exception as e:
                 # If analysis fails, delete the uploaded file
-                delete_file(filename)
+                await upload_service.release(upload.filename)
                 raise e
                 
         except HTTPException:
             raise
+        except MODEL_UNAVAILABLE_ERRORS as e:
+            raise _model_unavailable(e)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -139,53 +210,347 @@ class OutfitController:
             )
     
     @staticmethod
-    async def get_analysis(analysis_id: str, user_email: str) -> dict:
-        """Get a specific outfit analysis."""
-        # Get user
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
+    async def submit_analysis_job(file: UploadFile, user: User, occasion: Optional[str] = None, weather: Optional[str] = None) -> dict:
+        """
+        Save an uploaded outfit image and queue it for background analysis.
+        """
+        upload = await OutfitController._store_upload(file)
+        
+        try:
+            job = await job_service.enqueue(
+                user.id, upload.filename, upload.digest, occasion, weather, upload.variants
+            )
+        except Exception as e:
+            await upload_service.release(upload.filename)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error queueing analysis: {str(e)}"
+            )
+        
+        return {
+            "success": True,
+            "message": "Outfit queued for analysis",
+            "data": job
+        }
+
+    @staticmethod
+    async def analyze_batch(
+        files: List[UploadFile],
+        user: User,
+        occasion: Optional[str] = None,
+        weather: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Analyze many outfit images, streaming one NDJSON line per image as it finishes.
+
+        Each upload is stored as soon as it is read and its analysis starts
+        right away, with at most BATCH_ANALYZE_PARALLELISM running at once.
+        Finished analyses are saved with insert_many, in groups of whatever
+        completed while the previous group was being written. Lines carry the
+        image's `index` in the request; the stream ends with a summary line.
+        """
+        if not files:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files uploaded")
+        if len(files) > settings.BATCH_ANALYZE_MAX_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many files. Maximum per batch: {settings.BATCH_ANALYZE_MAX_FILES}"
+            )
+
+        semaphore = asyncio.Semaphore(settings.BATCH_ANALYZE_PARALLELISM)
+        # (index, filename, upload, analysis result or the HTTPException it failed with)
+        finished: asyncio.Queue = asyncio.Queue()
+        unsaved = {}
+        near_duplicates = {}
+
+        async def analyze(index: int, filename: str, upload: StoredUpload) -> None:
+            async with semaphore:
+                try:
+                    result = await analysis_service.analyze(upload.filename, upload.digest, occasion, weather)
+                except Exception as e:
+                    await upload_service.release(upload.filename)
+                    unsaved.pop(index, None)
+                    finished.put_nowait((index, filename, None, _batch_error(e)))
+                    return
+            near_duplicates[index] = await analysis_service.find_near_duplicate(user.id, upload.features)
+            finished.put_nowait((index, filename, upload, result))
+
+        # The form is closed once this method returns, so every upload is
+        # stored here; analyses of earlier files run while later ones are stored
+        tasks = []
+        for index, file in enumerate(files):
+            try:
+                upload = await OutfitController._store_upload(file)
+            except HTTPException as e:
+                finished.put_nowait((index, file.filename, None, e))
+                continue
+            unsaved[index] = upload
+            tasks.append(asyncio.create_task(analyze(index, file.filename, upload)))
+
+        def line(content: dict) -> str:
+            return json_bytes(content).decode("utf-8") + "\n"
+
+        async def results() -> AsyncIterator[str]:
+            succeeded = failed = 0
+            try:
+                while succeeded + failed < len(files):
+                    group = [await finished.get()]
+                    while len(group) < settings.BATCH_INSERT_MAX_SIZE and not finished.empty():
+                        group.append(finished.get_nowait())
+
+                    analyzed = [item for item in group if item[2] is not None]
+                    saved = {}
+                    uncertain = False
+                    if analyzed:
+                        try:
+                            analyses = await outfit_service.create_analyses([
+                                OutfitAnalysisCreate(
+                                    user_id=user.id,
+                                    image_filename=upload.filename,
+                                    image_variants=list(upload.variants),
+                                    analysis_result=result,
+                                    near_duplicate_of=near_duplicates.get(index)
+                                )
+                                for index, _, upload, result in analyzed
+                            ], [upload.features for _, _, upload, _ in analyzed])
+                            saved = {
+                                item[0]: analysis for item, analysis in zip(analyzed, analyses) if analysis is not None
+                            }
+                        except Exception as e:
+                            # The insert may have been applied before the error surfaced,
+                            # so keep the uploads; the reconciler drops unreferenced ones
+                            print(f"Error saving batch analyses: {e}")
+                            uncertain = True
+                        for index, _, upload, _ in analyzed:
+                            if index not in saved and not uncertain:
+                                await upload_service.release(upload.filename)
+                            unsaved.pop(index, None)
+
+                    for index, filename, upload, outcome in group:
+                        if index in saved:
+                            succeeded += 1
+                            yield line({"index": index, "filename": filename, "success": True, "data": saved[index]})
+                            continue
+                        if upload is not None:
+                            outcome = HTTPException(
+                                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="Could not confirm the analysis was saved" if uncertain else "Error saving analysis"
+                            )
+                        failed += 1
+                        yield line({
+                            "index": index,
+                            "filename": filename,
+                            "success": False,
+                            "status_code": outcome.status_code,
+                            "detail": outcome.detail
+                        })
+
+                yield line({"done": True, "succeeded": succeeded, "failed": failed})
+            finally:
+                # The client went away: stop analysing and drop uploads that were never saved
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for upload in list(unsaved.values()):
+                    await upload_service.release(upload.filename)
+
+        return results()
+
+    @staticmethod
+    async def get_job(job_id: str, user: User) -> dict:
+        """Get the status of an analysis job."""
+        job = await job_service.get_job(job_id, user.id)
+        if not job:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+                detail="Job not found"
             )
         
-        # Get analysis
-        analysis = await outfit_service.get_analysis_by_id(analysis_id)
+        return {
+            "success": True,
+            "data": job
+        }
+
+    @staticmethod
+    async def stream_job_events(job_id: str, user: User) -> AsyncIterator[str]:
+        """
+        Stream job status changes as Server-Sent Events until the job finishes.
         
-        if not analysis:
+        Updates from workers in this process arrive immediately; the job is
+        also re-read periodically so jobs run by other processes are seen too.
+        """
+        job = await job_service.get_job(job_id, user.id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        async def events() -> AsyncIterator[str]:
+            queue = job_service.subscribe(job_id)
+            current = job
+            last_sent = None
+            try:
+                while True:
+                    state = (current.status, current.attempts)
+                    if state != last_sent:
+                        yield f"event: status\ndata: {current.model_dump_json(by_alias=True)}\n\n"
+                        last_sent = state
+                    else:
+                        # Keep idle proxies from closing the connection
+                        yield ": keep-alive\n\n"
+                    
+                    if current.status in JOB_TERMINAL_STATUSES:
+                        return
+                    
+                    try:
+                        current = await asyncio.wait_for(queue.get(), settings.JOB_POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        current = await job_service.get_job(job_id, user.id) or current
+            finally:
+                job_service.unsubscribe(job_id, queue)
+        
+        return events()
+
+    @staticmethod
+    async def _check_readable(analysis_id: str, user: User) -> dict:
+        """
+        Return the version info of an analysis the user may read, or raise 404/403.
+        """
+        version = await outfit_service.get_analysis_version(analysis_id)
+        
+        if not version:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Analysis not found"
             )
         
-        # Check if user owns this analysis
-        if analysis.user_id != user.id:
+        # Public analyses are readable by anyone signed in; others only by their owner
+        if version["user_id"] != user.id and not version["is_public"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied"
             )
+        return version
+
+    @staticmethod
+    async def get_analysis(
+        analysis_id: str,
+        user: User,
+        response: Response,
+        if_none_match: Optional[str] = None
+    ):
+        """
+        Get a specific outfit analysis.
+        
+        The ETag comes from updated_at and the image URL layout, so a current
+        If-None-Match is answered with a 304 before the analysis itself is loaded.
+        """
+        version = await OutfitController._check_readable(analysis_id, user)
+        etag = version_etag("analysis", analysis_id, version["updated_at"], image_urls_version())
+        not_modified = check_not_modified(response, etag, if_none_match)
+        if not_modified:
+            return not_modified
         
+        analysis = await outfit_service.get_analysis_by_id(analysis_id)
+        if not analysis:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
         return {
             "success": True,
             "message": "Analysis retrieved successfully",
             "data": analysis
         }
-    
+
     @staticmethod
-    async def get_user_analyses(user_email: str, limit: int = 50, skip: int = 0) -> dict:
-        """Get all outfit analyses for a user."""
-        # Get user
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
+    async def get_similar(analysis_id: str, user: User, scope: str = "mine", limit: int = 10) -> dict:
+        """
+        Get the analyses that look most like this one.
+        
+        scope "mine" searches the user's own analyses and "public" the
+        community's. Matches whose image is nearly identical are flagged
+        with near_duplicate.
+        """
+        await OutfitController._check_readable(analysis_id, user)
+        features = await outfit_service.get_features(analysis_id)
+        if not features:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+                detail="Similarity features are not available for this analysis"
             )
         
-        # Get analyses
-        analyses = await outfit_service.get_user_analyses(user.id, limit, skip)
+        public = scope == "public"
+        matches = await similarity_service.find_similar(
+            PUBLIC_SCOPE if public else user.id, features, limit, exclude_id=analysis_id
+        )
+        items = await outfit_service.get_feed_items(
+            [match_id for match_id, _, _ in matches],
+            {"is_public": True} if public else {"user_id": user.id},
+            user.id
+        )
+        
+        similar = [
+            SimilarOutfit(
+                **items[match_id].model_dump(by_alias=True),
+                similarity=round(similarity, 4),
+                near_duplicate=distance <= settings.SIMILARITY_DUPLICATE_MAX_DISTANCE
+            )
+            for match_id, similarity, distance in matches
+            if match_id in items
+        ]
+        return {
+            "success": True,
+            "data": similar
+        }
+
+    @staticmethod
+    async def get_comments(analysis_id: str, user: User, limit: int = 20, cursor: Optional[str] = None) -> dict:
+        """Get a page of comments on an analysis, newest first."""
+        await OutfitController._check_readable(analysis_id, user)
+        try:
+            comments, next_cursor = await comment_service.get_comments(analysis_id, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return {
+            "success": True,
+            "data": comments,
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    async def get_user_analyses(
+        user: User,
+        response: Response,
+        limit: int = 50,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        if_none_match: Optional[str] = None
+    ):
+        """
+        Get all outfit analyses for a user.
+        
+        The page's ETag is built from the ids and updated_at of its analyses,
+        the total count and the image URL layout, which are checked against
+        If-None-Match before the analyses themselves are loaded.
+        """
+        try:
+            versions = await outfit_service.get_user_analysis_versions(user.id, limit, skip, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         total_count = await outfit_service.get_analysis_count(user.id)
         
+        etag = version_etag(
+            "analyses", user.id, limit, skip, cursor, total_count, versions, image_urls_version()
+        )
+        not_modified = check_not_modified(response, etag, if_none_match)
+        if not_modified:
+            return not_modified
+        
+        # Get analyses
+        analyses, next_cursor = await outfit_service.get_user_analyses(user.id, limit, skip, cursor)
+        
         return {
             "success": True,
             "message": "Analyses retrieved successfully",
@@ -193,26 +558,16 @@ class OutfitController:
                 "analyses": analyses,
                 "total": total_count,
                 "limit": limit,
-                "skip": skip
+                "skip": skip,
+                "next_cursor": next_cursor
             }
         }
     
     @staticmethod
-    async def delete_analysis(analysis_id: str, user_email: str) -> dict:
+    async def delete_analysis(analysis_id: str, user: User) -> dict:
         """Delete an outfit analysis."""
-        # Get user
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
         # Get analysis to get filename
         analysis = await outfit_service.get_analysis_by_id(analysis_id)
-        if analysis and analysis.user_id == user.id:
-            # Delete file
-            delete_file(analysis.image_filename)
         
         # Delete analysis
         deleted = await outfit_service.delete_analysis(analysis_id, user.id)
@@ -223,6 +578,14 @@ class OutfitController:
                 detail="Analysis not found or access denied"
             )
         
+        # Drop the analysis' reference to its image; shared images stay
+        if analysis:
+            await upload_service.release(analysis.image_filename)
+        similarity_service.forget(analysis_id, user.id)
+        await comment_service.delete_for_analysis(analysis_id)
+        if analysis and analysis.is_public:
+            feed_cache.invalidate_all()
+        
         return {
             "success": True,
             "message": "Analysis deleted successfully"
@@ -230,16 +593,8 @@ class OutfitController:
 
 
     @staticmethod
-    async def chat_about_outfit(analysis_id: str, user_email: str, message: str, history: List[dict]) -> dict:
+    async def chat_about_outfit(analysis_id: str, user: User, message: str, history: List[dict]) -> dict:
         """Chat with AI stylist about specific outfit."""
-        # Get user
-        user = await user_service.get_user_by_email(user_email)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
         # Get analysis
         analysis = await outfit_service.get_analysis_by_id(analysis_id)
         if not analysis:
@@ -256,11 +611,14 @@ class OutfitController:
             )
             
         # Call Gemini using the serialized analysis result
-        response = await gemini_service.chat_with_stylist(
-            analysis.analysis_result.model_dump(), 
-            history, 
-            message
-        )
+        try:
+            response = await gemini_service.chat_with_stylist(
+                analysis.analysis_result.model_dump(), 
+                history, 
+                message
+            )
+        except MODEL_UNAVAILABLE_ERRORS as e:
+            raise _model_unavailable(e)
         
         return {
             "success": True,
@@ -268,4 +626,61 @@ class OutfitController:
         }
 
 
+    @staticmethod
+    async def stream_chat_about_outfit(analysis_id: str, user: User, message: str, history: List[dict]) -> AsyncIterator[str]:
+        """
+        Chat with AI stylist about specific outfit, streamed as Server-Sent Events.
+        
+        The first chunk is awaited before returning, so a busy or failing model
+        still produces a proper HTTP error instead of an empty 200 stream.
+        """
+        # Get analysis
+        analysis = await outfit_service.get_analysis_by_id(analysis_id)
+        if not analysis:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
+            
+        # Check ownership
+        if analysis.user_id != user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
+        stream = gemini_service.stream_chat_with_stylist(
+            analysis.analysis_result.model_dump(),
+            history,
+            message
+        )
+        try:
+            first_chunk = await anext(stream)
+        except StopAsyncIteration:
+            first_chunk = None
+        except MODEL_UNAVAILABLE_ERRORS as e:
+            raise _model_unavailable(e)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error in chat: {str(e)}"
+            )
+        
+        async def events() -> AsyncIterator[str]:
+            try:
+                if first_chunk is not None:
+                    yield f"data: {json.dumps({'text': first_chunk})}\n\n"
+                async for chunk in stream:
+                    yield f"data: {json.dumps({'text': chunk})}\n\n"
+                yield "event: done\ndata: {}\n\n"
+            except Exception as e:
+                print(f"Error in chat stream: {e}")
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            finally:
+                # Runs on client disconnect too, which cancels the upstream stream
+                await stream.aclose()
+        
+        return events()
+
+
 outfit_controller = OutfitController()
@@ -1,24 +1,53 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import os
 
 from config.settings import settings
 from config.database import connect_to_mongo, close_mongo_connection
+from config.indexes import ensure_indexes, verify_indexes
 from routes.auth_routes import router as auth_router
 from routes.outfit_routes import router as outfit_router
 from routes.closet_routes import router as closet_router
+from services.gemini_service import gemini_executor, gemini_service
+from utils.image_utils import image_executor
+from auth.jwt_handler import password_executor
+from utils.compression import CompressionMiddleware
+from utils.static_files import ImmutableStaticFiles
+from storage.factory import storage
+from utils.file_utils import exceeds_upload_limit, upload_too_large_message
+from services.analysis_cache import analysis_cache
+from services.feed_cache import feed_cache
+from services.job_service import job_service
+from services.cleanup_service import cleanup_service
+from services.similarity_service import similarity_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
-    # Create upload directory if it doesn't exist
+    # Create the upload directory, which also holds uploads being spooled for remote storage
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    # Create indexes, optionally refusing to start if a query would scan a collection
+    await ensure_indexes()
+    if settings.INDEX_CHECK_ON_STARTUP:
+        await verify_indexes()
+    # Drop cached analyses from older prompts
+    await analysis_cache.purge_stale()
+    # Start background analysis workers
+    job_service.start()
+    # Start deleting released uploads and reconciling orphaned ones
+    cleanup_service.start()
     yield
     # Shutdown
+    await job_service.stop()
+    await cleanup_service.stop()
+    gemini_executor.shutdown()
+    image_executor.shutdown()
+    password_executor.shutdown()
+    await storage.close()
     await close_mongo_connection()
 
 
@@ -38,8 +67,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Compress JSON and text responses; streamed responses pass through
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
+# Upload endpoints and the number of files each one accepts
+UPLOAD_PATHS = {
+    "/api/outfit/analyze": 1,
+    "/api/outfit/analyze/batch": settings.BATCH_ANALYZE_MAX_FILES,
+}
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads whose Content-Length is already over the limit, before reading the body."""
+    max_files = UPLOAD_PATHS.get(request.url.path)
+    if max_files and exceeds_upload_limit(request.headers.get("content-length"), max_files):
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": upload_too_large_message()}
+        )
+    return await call_next(request)
+
+
+# Serve uploads from the local backend; their names never get reused, so they are cached as
+# immutable. Remote backends hand out URLs pointing straight at the bucket.
+if storage.name == "local":
+    app.mount("/uploads", ImmutableStaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # Include routers
 app.include_router(auth_router)
@@ -60,7 +118,16 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "service": "AI Outfit Analyzer API"
+        "service": "AI Outfit Analyzer API",
+        "gemini": gemini_executor.stats(),
+        "gemini_resilience": gemini_service.caller.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "feed_cache": feed_cache.stats(),
+        "storage": storage.name,
+        "upload_cleanup": cleanup_service.stats(),
+        "similarity": similarity_service.stats(),
+        "image_preprocessing": gemini_service.image_stats,
+        "structured_output": gemini_service.structured_output_stats()
     }
 
 
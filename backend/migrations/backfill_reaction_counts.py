@@ -0,0 +1,38 @@
+"""
+Backfill like_count/dislike_count on outfit analyses from their reaction arrays.
+
+The counters are maintained by the like/dislike toggles; analyses created
+before they existed have none. The backfill is a single server-side update,
+so it is safe to run while the API is serving and can be re-run at any time.
+
+Usage (from the backend directory):
+    python -m migrations.backfill_reaction_counts
+"""
+import asyncio
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+
+
+async def backfill_reaction_counts() -> int:
+    """Recompute the reaction counters of every analysis; returns how many changed."""
+    db = await get_database()
+    result = await db.outfit_analyses.update_many(
+        {},
+        [{"$set": {
+            "like_count": {"$size": {"$ifNull": ["$likes", []]}},
+            "dislike_count": {"$size": {"$ifNull": ["$dislikes", []]}}
+        }}]
+    )
+    return result.modified_count
+
+
+async def _main() -> None:
+    await connect_to_mongo()
+    try:
+        updated = await backfill_reaction_counts()
+        print(f"Updated reaction counts on {updated} analyses")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
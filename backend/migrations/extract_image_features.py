@@ -0,0 +1,83 @@
+"""
+Compute similarity features for analyses saved before they existed.
+
+Analyses without current `features` are processed in batches on the image
+worker pool. Features already computed for the same upload are reused, and
+each analysis is updated as soon as its features are known, so an
+interrupted run can be restarted. Analyses whose original file is missing
+are skipped and stay out of similar-outfit search.
+
+Usage (from the backend directory):
+    python -m migrations.extract_image_features [--batch-size 50]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+from config.settings import settings
+from services.upload_service import upload_service
+from storage.factory import storage
+from utils.image_features import FEATURE_VERSION
+from utils.image_utils import image_executor
+
+
+async def _extract(analysis: dict, slots: asyncio.Semaphore) -> bool:
+    db = await get_database()
+    filename = analysis["image_filename"]
+    features = await upload_service.get_features(filename)
+    if not features or features.get("version") != FEATURE_VERSION:
+        # Stay within the pool instead of having the executor reject the overflow
+        async with slots:
+            try:
+                features = await upload_service.extract_features(filename)
+            except FileNotFoundError:
+                return False
+    if not features:
+        return False
+    # updated_at lets running servers pick the analysis up on their next refresh
+    await db.outfit_analyses.update_one(
+        {"_id": analysis["_id"]},
+        {"$set": {"features": features, "updated_at": datetime.utcnow()}}
+    )
+    return True
+
+
+async def extract_image_features(batch_size: int = 50) -> dict:
+    """Backfill features for every analysis lacking current ones; returns totals."""
+    db = await get_database()
+    totals = {"extracted": 0, "skipped": 0}
+    slots = asyncio.Semaphore(settings.IMAGE_WORKERS)
+    last_id = None
+
+    while True:
+        query = {"features.version": {"$ne": FEATURE_VERSION}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.outfit_analyses.find(query, {"image_filename": 1}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return totals
+
+        # Skipped analyses still match the query, so page by _id
+        last_id = batch[-1]["_id"]
+        results = await asyncio.gather(*(_extract(analysis, slots) for analysis in batch))
+        totals["extracted"] += sum(results)
+        totals["skipped"] += len(results) - sum(results)
+        print(f"Extracted features for {totals['extracted']} analyses ({totals['skipped']} skipped)")
+
+
+async def _main(batch_size: int) -> None:
+    await connect_to_mongo()
+    try:
+        totals = await extract_image_features(batch_size)
+        print(f"Done: {totals['extracted']} extracted, {totals['skipped']} skipped")
+    finally:
+        image_executor.shutdown()
+        await storage.close()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
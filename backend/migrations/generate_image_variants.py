@@ -0,0 +1,79 @@
+"""
+Generate thumb/medium WebP derivatives for analyses uploaded before they existed.
+
+Analyses without `image_variants` are processed in batches on the image
+worker pool. Each one records the variants that were written, so an
+interrupted run can be restarted. Analyses whose original file is missing
+are skipped and keep serving the original URL.
+
+Usage (from the backend directory):
+    python -m migrations.generate_image_variants [--batch-size 50]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+from config.settings import settings
+from services.upload_service import upload_service
+from storage.factory import storage
+from utils.image_utils import image_executor
+
+
+async def _generate(analysis: dict, slots: asyncio.Semaphore) -> bool:
+    db = await get_database()
+    filename = analysis["image_filename"]
+    # Stay within the pool instead of having the executor reject the overflow
+    async with slots:
+        try:
+            variants = await upload_service.generate_variants(filename)
+        except FileNotFoundError:
+            return False
+    if not variants:
+        return False
+    # updated_at changes the analysis' ETag, so clients pick up the new image_urls
+    await db.outfit_analyses.update_one(
+        {"_id": analysis["_id"]},
+        {"$set": {"image_variants": list(variants), "updated_at": datetime.utcnow()}}
+    )
+    return True
+
+
+async def generate_image_variants(batch_size: int = 50) -> dict:
+    """Backfill variants for every analysis lacking them; returns totals."""
+    db = await get_database()
+    totals = {"generated": 0, "skipped": 0}
+    slots = asyncio.Semaphore(settings.IMAGE_WORKERS)
+    last_id = None
+
+    while True:
+        query = {"$or": [{"image_variants": {"$exists": False}}, {"image_variants": []}]}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.outfit_analyses.find(query, {"image_filename": 1}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return totals
+
+        # Skipped analyses still match the query, so page by _id
+        last_id = batch[-1]["_id"]
+        results = await asyncio.gather(*(_generate(analysis, slots) for analysis in batch))
+        totals["generated"] += sum(results)
+        totals["skipped"] += len(results) - sum(results)
+        print(f"Generated variants for {totals['generated']} analyses ({totals['skipped']} skipped)")
+
+
+async def _main(batch_size: int) -> None:
+    await connect_to_mongo()
+    try:
+        totals = await generate_image_variants(batch_size)
+        print(f"Done: {totals['generated']} generated, {totals['skipped']} skipped")
+    finally:
+        image_executor.shutdown()
+        await storage.close()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
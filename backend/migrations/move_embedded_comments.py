@@ -0,0 +1,84 @@
+"""
+Move comments embedded in outfit analyses into the `outfit_comments` collection.
+
+Analyses are processed in batches. For each batch the comments are upserted
+into `outfit_comments`, then `comment_count` is recomputed from the
+collection and the embedded array is removed. Upserts match on the full
+comment, so a run interrupted between those steps can simply be restarted
+without duplicating anything.
+
+Usage (from the backend directory):
+    python -m migrations.move_embedded_comments [--batch-size 200]
+"""
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+
+
+async def move_embedded_comments(batch_size: int = 200) -> dict:
+    """Migrate every embedded comment thread; returns analysis and comment totals."""
+    db = await get_database()
+    totals = {"analyses": 0, "comments": 0}
+
+    while True:
+        # Each migrated analysis loses its array, so the query itself advances
+        batch = await db.outfit_analyses.find(
+            {"comments": {"$exists": True}},
+            {"comments": 1}
+        ).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return totals
+
+        analysis_ids = [str(analysis["_id"]) for analysis in batch]
+        upserts = []
+        for analysis_id, analysis in zip(analysis_ids, batch):
+            for comment in analysis.get("comments") or []:
+                key = {
+                    "analysis_id": analysis_id,
+                    "user_id": comment.get("user_id"),
+                    "created_at": comment.get("created_at"),
+                    "text": comment.get("text")
+                }
+                upserts.append(UpdateOne(
+                    key,
+                    {"$setOnInsert": {**key, "username": comment.get("username")}},
+                    upsert=True
+                ))
+        if upserts:
+            await db.outfit_comments.bulk_write(upserts, ordered=False)
+
+        counts = {
+            group["_id"]: group["count"]
+            async for group in db.outfit_comments.aggregate([
+                {"$match": {"analysis_id": {"$in": analysis_ids}}},
+                {"$group": {"_id": "$analysis_id", "count": {"$sum": 1}}}
+            ])
+        }
+        await db.outfit_analyses.bulk_write([
+            UpdateOne(
+                {"_id": analysis["_id"]},
+                {"$set": {"comment_count": counts.get(analysis_id, 0)}, "$unset": {"comments": ""}}
+            )
+            for analysis_id, analysis in zip(analysis_ids, batch)
+        ], ordered=False)
+
+        totals["analyses"] += len(batch)
+        totals["comments"] += len(upserts)
+        print(f"Migrated {totals['comments']} comments from {totals['analyses']} analyses")
+
+
+async def _main(batch_size: int) -> None:
+    await connect_to_mongo()
+    try:
+        totals = await move_embedded_comments(batch_size)
+        print(f"Done: {totals['comments']} comments from {totals['analyses']} analyses")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
@@ -0,0 +1,75 @@
+"""
+Move uploads from the flat upload directory into the sharded storage layout
+and create their reference counts.
+
+Before the storage backends, every upload sat directly in UPLOAD_DIR. This
+moves each of those files (and its derivatives) to its shard directory,
+keeping its name, then recounts the references of every upload from the
+analyses and pending jobs using it. Files already moved are left alone, so
+it can be re-run.
+Run it with STORAGE_BACKEND=local before switching to another backend.
+
+Usage (from the backend directory):
+    python -m migrations.shard_uploads
+"""
+import asyncio
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from config.database import get_database, connect_to_mongo, close_mongo_connection
+from config.settings import settings
+from storage.local import LocalStorage
+from models.job import JOB_TERMINAL_STATUSES
+
+
+def _flat_files(root: str):
+    with os.scandir(root) as entries:
+        return [(entry.name, entry.stat().st_size) for entry in entries if entry.is_file() and not entry.name.startswith(".")]
+
+
+async def shard_uploads() -> dict:
+    """Shard every flat upload and record its references; returns totals."""
+    local = LocalStorage(settings.UPLOAD_DIR)
+    files = await asyncio.to_thread(_flat_files, settings.UPLOAD_DIR)
+    for name, _ in files:
+        await local.put_file(os.path.join(settings.UPLOAD_DIR, name), name)
+
+    db = await get_database()
+    refs = {}
+    async for analysis in db.outfit_analyses.find({}, {"image_filename": 1, "image_variants": 1}):
+        entry = refs.setdefault(analysis["image_filename"], {"refs": 0, "variants": analysis.get("image_variants") or []})
+        entry["refs"] += 1
+    async for job in db.analysis_jobs.find({"status": {"$nin": list(JOB_TERMINAL_STATUSES)}}, {"image_filename": 1, "image_variants": 1}):
+        entry = refs.setdefault(job["image_filename"], {"refs": 0, "variants": job.get("image_variants") or []})
+        entry["refs"] += 1
+
+    sizes = dict(files)
+    now = datetime.utcnow()
+    updates = [
+        UpdateOne(
+            {"_id": key},
+            {
+                "$set": {"refs": entry["refs"], "variants": entry["variants"]},
+                "$setOnInsert": {"size": sizes.get(key), "created_at": now}
+            },
+            upsert=True
+        )
+        for key, entry in refs.items()
+    ]
+    if updates:
+        await db.stored_objects.bulk_write(updates, ordered=False)
+
+    return {"files": len(files), "referenced": len(refs)}
+
+
+async def _main() -> None:
+    await connect_to_mongo()
+    try:
+        totals = await shard_uploads()
+        print(f"Moved {totals['files']} files; recorded references to {totals['referenced']} uploads")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, BeforeValidator
-from typing import Optional, List, Annotated
+from typing import Any, Dict, Optional, List, Annotated, Union
 from datetime import datetime
 
 # Define PyObjectId helper to handle MongoDB ObjectId
@@ -34,3 +34,64 @@ class ClosetItem(ClosetItemBase):
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
+
+class ClosetItemSummary(BaseModel):
+    """The fields of a closet item shown in the closet grid."""
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    name: str
+    category: str
+    color: str
+    image_url: Optional[str] = None
+    tags: List[str] = []
+    created_at: datetime
+
+    class Config:
+        populate_by_name = True
+
+class ClosetFilter(BaseModel):
+    category: Optional[str] = None
+    color: Optional[str] = None
+    # Items must carry every one of these tags
+    tags: Optional[List[str]] = None
+
+class ClosetPage(BaseModel):
+    items: List[Union[ClosetItem, ClosetItemSummary]]
+    next_cursor: Optional[str] = None
+
+class ClosetItemBulkUpdate(ClosetItemUpdate):
+    id: str
+
+class BulkItemError(BaseModel):
+    # Position of the item in the request, or line number for imports
+    index: int
+    id: Optional[str] = None
+    detail: str
+
+class ClosetBulkResult(BaseModel):
+    items: List[ClosetItem] = []
+    deleted_ids: List[str] = []
+    errors: List[BulkItemError] = []
+
+class ClosetBulkRequest(BaseModel):
+    # Validated one by one, so a bad item is reported instead of failing the request
+    items: List[Dict[str, Any]]
+
+class ClosetBulkDelete(BaseModel):
+    ids: List[str]
+
+class ClosetImportResult(BaseModel):
+    imported: int = 0
+    error_count: int = 0
+    # The first CLOSET_IMPORT_MAX_ERRORS errors; index is the line number
+    errors: List[BulkItemError] = []
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class ClosetFacets(BaseModel):
+    total: int = 0
+    categories: List[FacetCount] = []
+    colors: List[FacetCount] = []
+    # The CLOSET_FACET_TAG_LIMIT most used tags
+    tags: List[FacetCount] = []
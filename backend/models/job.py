@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class AnalysisJob(BaseModel):
+    id: str = Field(alias="_id")
+    user_id: str
+    status: str
+    attempts: int = 0
+    max_attempts: int
+    analysis_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "_id": "507f1f77bcf86cd799439013",
+                "user_id": "507f1f77bcf86cd799439012",
+                "status": "succeeded",
+                "attempts": 1,
+                "max_attempts": 3,
+                "analysis_id": "507f1f77bcf86cd799439011",
+                "error": None,
+                "created_at": "2024-01-01T00:00:00",
+                "updated_at": "2024-01-01T00:00:05"
+            }
+        }
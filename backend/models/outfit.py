@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import Dict, List, Optional
 from datetime import datetime
+from utils.file_utils import image_urls as build_image_urls
 
 
 class ClothingItem(BaseModel):
@@ -40,20 +41,29 @@ class AnalysisResult(BaseModel):
 
 
 class Comment(BaseModel):
+    id: Optional[str] = Field(None, alias="_id")
     user_id: str
     username: str
     text: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        populate_by_name = True
 
 
 class OutfitAnalysisBase(BaseModel):
     image_filename: str
+    image_variants: List[str] = []
     analysis_result: AnalysisResult
     is_public: bool = False
     likes: List[str] = []
     dislikes: List[str] = []
+    like_count: int = 0
+    dislike_count: int = 0
     tags: List[str] = []
-    comments: List[Comment] = []
+    comment_count: int = 0
+    # Earlier analysis of the same user whose image looks nearly identical
+    near_duplicate_of: Optional[str] = None
 
 
 class OutfitAnalysisCreate(OutfitAnalysisBase):
@@ -64,6 +74,13 @@ class OutfitAnalysis(OutfitAnalysisBase):
     id: str = Field(alias="_id")
     user_id: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def image_urls(self) -> Dict[str, str]:
+        """URLs of the original image and its thumb/medium derivatives."""
+        return build_image_urls(self.image_filename, self.image_variants)
     
     class Config:
         populate_by_name = True
@@ -95,6 +112,46 @@ class OutfitAnalysis(OutfitAnalysisBase):
         }
 
 
+class ReactionState(BaseModel):
+    """A user's reaction to an analysis after a like/dislike toggle."""
+    liked: bool
+    disliked: bool
+    like_count: int
+    dislike_count: int
+
+
+class FeedItem(BaseModel):
+    """Lean summary of a public analysis, as shown in the community feed."""
+    id: str = Field(alias="_id")
+    user_id: str
+    image_filename: str
+    image_variants: List[str] = []
+    score: float
+    style_description: str
+    tags: List[str] = []
+    like_count: int = 0
+    dislike_count: int = 0
+    comment_count: int = 0
+    liked_by_me: bool = False
+    disliked_by_me: bool = False
+    created_at: datetime
+
+    @computed_field
+    @property
+    def image_urls(self) -> Dict[str, str]:
+        """URLs of the original image and its thumb/medium derivatives."""
+        return build_image_urls(self.image_filename, self.image_variants)
+
+    class Config:
+        populate_by_name = True
+
+
+class SimilarOutfit(FeedItem):
+    """An analysis returned by similar-outfit search."""
+    similarity: float
+    near_duplicate: bool = False
+
+
 class OutfitAnalysisResponse(BaseModel):
     success: bool
     message: str
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Query, Form, Body
-from typing import Optional, List
-from models.user import TokenData
+from fastapi import APIRouter, Depends, File, UploadFile, Query, Form, Body, Header, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional, List
+from models.user import User
 from models.outfit import ChatRequest
-from auth.jwt_handler import get_current_user
+from auth.dependencies import get_current_user, get_optional_user
 from controllers.outfit_controller import outfit_controller
 
 router = APIRouter(prefix="/api/outfit", tags=["Outfit Analysis"])
@@ -11,60 +12,109 @@ router = APIRouter(prefix="/api/outfit", tags=["Outfit Analysis"])
 @router.get("/community/feed")
 async def get_community_feed(
     limit: int = Query(50, ge=1, le=100),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
-    """Get the community feed (public outfits)."""
-    return await outfit_controller.get_community_feed(limit, skip)
+    """
+    Get the community feed (public outfits).
+    
+    Items are summaries with engagement counts; `liked_by_me` and
+    `disliked_by_me` are only set when a token is sent. The full analysis,
+    comes from `GET /api/outfit/{analysis_id}` and its comments from
+    `GET /api/outfit/{analysis_id}/comments`.
+    
+    Pass the `next_cursor` of a page as `cursor` to get the following page.
+    Responses carry an `ETag`; send it back as `If-None-Match` to get a 304
+    when the page has not changed.
+    """
+    return await outfit_controller.get_community_feed(limit, skip, cursor, current_user, if_none_match)
 
 
 @router.post("/{analysis_id}/toggle-public")
 async def toggle_public_status(
     analysis_id: str,
     tags: List[str] = Body(None),
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """Toggle public visibility of an outfit."""
-    return await outfit_controller.toggle_public_status(analysis_id, current_user.email, tags)
+    return await outfit_controller.toggle_public_status(analysis_id, current_user, tags)
 
 
 @router.post("/{analysis_id}/like")
 async def toggle_like(
     analysis_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """Toggle like on an outfit."""
-    return await outfit_controller.toggle_like(analysis_id, current_user.email)
+    return await outfit_controller.toggle_like(analysis_id, current_user)
 
 @router.post("/{analysis_id}/dislike")
 async def toggle_dislike(
     analysis_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """Toggle dislike on an outfit."""
-    return await outfit_controller.toggle_dislike(analysis_id, current_user.email)
+    return await outfit_controller.toggle_dislike(analysis_id, current_user)
 
 
 @router.post("/{analysis_id}/comment")
 async def add_comment(
     analysis_id: str,
     comment: dict = Body(...),
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """Add a comment to an outfit."""
-    return await outfit_controller.add_comment(analysis_id, current_user.email, comment.get("text", ""))
+    return await outfit_controller.add_comment(analysis_id, current_user, comment.get("text", ""))
+
+
+@router.get("/{analysis_id}/comments")
+async def get_comments(
+    analysis_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the comments on an outfit, newest first.
+    
+    Pass the `next_cursor` of a page as `cursor` to get older comments.
+    """
+    return await outfit_controller.get_comments(analysis_id, current_user, limit, cursor)
+
+
+@router.get("/{analysis_id}/similar")
+async def get_similar_outfits(
+    analysis_id: str,
+    scope: Literal["mine", "public"] = Query("mine"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the outfits that look most like this one, most similar first.
+    
+    Searches your own analyses (`scope=mine`) or the community's
+    (`scope=public`), comparing image features computed at upload time.
+    """
+    return await outfit_controller.get_similar(analysis_id, current_user, scope, limit)
 
 
 @router.post("/analyze")
 async def analyze_outfit(
+    response: Response,
     file: UploadFile = File(...),
     occasion: Optional[str] = Form(None),
     weather: Optional[str] = Form(None),
-    current_user: TokenData = Depends(get_current_user)
+    async_job: bool = Query(False),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Upload an outfit image and get AI analysis.
     
     - **file**: Image file (JPG, JPEG, PNG, max 5MB)
+    - **async_job**: Return 202 with a job right after the upload is saved
+      instead of waiting for the analysis
     
     Returns:
     - Detected clothing items
@@ -74,62 +124,163 @@ async def analyze_outfit(
     - Cheaper alternatives
     - Color matching recommendations
     """
-    return await outfit_controller.analyze_outfit(file, current_user.email, occasion, weather)
+    if async_job:
+        result = await outfit_controller.submit_analysis_job(file, current_user, occasion, weather)
+        response.status_code = status.HTTP_202_ACCEPTED
+        response.headers["Location"] = f"/api/outfit/jobs/{result['data'].id}"
+        return result
+    return await outfit_controller.analyze_outfit(file, current_user, occasion, weather)
+
+
+@router.post("/analyze/batch")
+async def analyze_outfits(
+    files: List[UploadFile] = File(...),
+    occasion: Optional[str] = Form(None),
+    weather: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload several outfit images and stream their analyses as NDJSON.
+    
+    - **files**: Image files (JPG, JPEG, PNG, max 5MB each, up to 30 per request)
+    
+    Images are analyzed in parallel and each line is written as soon as its
+    analysis is saved, so lines arrive in completion order: `{"index",
+    "filename", "success": true, "data"}` or `{"index", "filename",
+    "success": false, "status_code", "detail"}`. The last line is
+    `{"done": true, "succeeded", "failed"}`.
+    """
+    results = await outfit_controller.analyze_batch(files, current_user, occasion, weather)
+    return StreamingResponse(
+        results,
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the status of a background analysis job.
+    
+    Once the status is `succeeded`, `analysis_id` points at the saved analysis.
+    """
+    return await outfit_controller.get_job(job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Subscribe to status changes of a background analysis job (Server-Sent Events).
+    
+    The stream ends once the job has succeeded or failed.
+    """
+    events = await outfit_controller.stream_job_events(job_id, current_user)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/{analysis_id}")
 async def get_analysis(
     analysis_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Get a specific outfit analysis by ID.
     
+    Returns the full document; comments are paged through
+    `GET /api/outfit/{analysis_id}/comments`. Any signed-in user may read a
+    public analysis; private ones are only visible to their owner.
+    
     - **analysis_id**: MongoDB ObjectId of the analysis
     """
-    return await outfit_controller.get_analysis(analysis_id, current_user.email)
+    return await outfit_controller.get_analysis(analysis_id, current_user, response, if_none_match)
 
 
 @router.get("/user/all")
 async def get_user_analyses(
+    response: Response,
     limit: int = Query(50, ge=1, le=100),
     skip: int = Query(0, ge=0),
-    current_user: TokenData = Depends(get_current_user)
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Get all outfit analyses for the authenticated user.
     
     - **limit**: Maximum number of results (1-100)
-    - **skip**: Number of results to skip (for pagination)
+    - **skip**: Number of results to skip (fallback when no cursor is given)
+    - **cursor**: `next_cursor` from the previous page
+    
+    Send the page's `ETag` back as `If-None-Match` to get a 304 when
+    nothing on it has changed.
     """
-    return await outfit_controller.get_user_analyses(current_user.email, limit, skip)
+    return await outfit_controller.get_user_analyses(current_user, response, limit, skip, cursor, if_none_match)
 
 
 @router.delete("/{analysis_id}")
 async def delete_analysis(
     analysis_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Delete an outfit analysis.
     
     - **analysis_id**: MongoDB ObjectId of the analysis to delete
     """
-    return await outfit_controller.delete_analysis(analysis_id, current_user.email)
+    return await outfit_controller.delete_analysis(analysis_id, current_user)
 
 
 @router.post("/chat/{analysis_id}")
 async def chat_about_outfit(
     analysis_id: str,
     chat_request: ChatRequest,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Chat with the AI stylist about a specific outfit.
     """
     return await outfit_controller.chat_about_outfit(
         analysis_id, 
-        current_user.email,
+        current_user,
+        chat_request.message,
+        [m.model_dump() for m in chat_request.history]
+    )
+
+
+
+@router.post("/chat/{analysis_id}/stream")
+async def stream_chat_about_outfit(
+    analysis_id: str,
+    chat_request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Chat with the AI stylist, streaming the reply as Server-Sent Events.
+    
+    Each `data:` event carries `{"text": ...}`; the stream ends with a `done`
+    event, or an `error` event if generation fails midway.
+    """
+    events = await outfit_controller.stream_chat_about_outfit(
+        analysis_id,
+        current_user,
         chat_request.message,
         [m.model_dump() for m in chat_request.history]
     )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,107 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from config.database import get_database
+from config.settings import settings
+from models.outfit import AnalysisResult
+from services.gemini_service import GEMINI_MODEL_NAME, PROMPT_VERSION
+from utils.cache import TTLCache
+
+
+def _normalize(value: Optional[str]) -> str:
+    """Normalize free-text context so trivial differences share a cache entry."""
+    if not value:
+        return ""
+    return " ".join(value.lower().split())
+
+
+class AnalysisCache:
+    """
+    Cache of Gemini analysis results keyed by image content and context.
+
+    Lookups hit an in-process LRU first and fall back to the
+    `analysis_cache` collection, whose documents expire through a TTL index.
+    The key includes the model name and PROMPT_VERSION, so bumping the prompt
+    version makes every older entry unreachable.
+    """
+
+    def __init__(self):
+        self._memory = TTLCache(
+            settings.ANALYSIS_CACHE_MAX_ENTRIES,
+            settings.ANALYSIS_CACHE_MEMORY_TTL_SECONDS
+        )
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key(image_digest: str, occasion: Optional[str] = None, weather: Optional[str] = None) -> str:
+        """Build the cache key for an image digest and its analysis context."""
+        parts = [image_digest, _normalize(occasion), _normalize(weather), GEMINI_MODEL_NAME, PROMPT_VERSION]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[AnalysisResult]:
+        """Return a cached analysis result, or None on a miss."""
+        result = self._memory.get(key)
+        if result is not None:
+            self.memory_hits += 1
+            return result
+
+        db = await get_database()
+        doc = await db.analysis_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        if doc is None:
+            self.misses += 1
+            return None
+
+        result = AnalysisResult(**doc["result"])
+        self._memory.set(key, result)
+        self.mongo_hits += 1
+        return result
+
+    async def set(self, key: str, result: AnalysisResult) -> None:
+        """Store an analysis result in both tiers."""
+        self._memory.set(key, result)
+
+        now = datetime.utcnow()
+        db = await get_database()
+        await db.analysis_cache.replace_one(
+            {"_id": key},
+            {
+                "result": result.model_dump(),
+                "model": GEMINI_MODEL_NAME,
+                "prompt_version": PROMPT_VERSION,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=settings.ANALYSIS_CACHE_TTL_SECONDS)
+            },
+            upsert=True
+        )
+
+    async def purge_stale(self) -> int:
+        """Delete entries written for another model or prompt version."""
+        db = await get_database()
+        result = await db.analysis_cache.delete_many({
+            "$or": [
+                {"model": {"$ne": GEMINI_MODEL_NAME}},
+                {"prompt_version": {"$ne": PROMPT_VERSION}}
+            ]
+        })
+        return result.deleted_count
+
+    async def invalidate_all(self) -> int:
+        """Drop every cached analysis from both tiers."""
+        self._memory.clear()
+        db = await get_database()
+        result = await db.analysis_cache.delete_many({})
+        return result.deleted_count
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for both tiers."""
+        return {
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "memory_size": self._memory.stats()["size"],
+        }
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,79 @@
+from typing import Any, Dict, Optional, Sequence
+from models.outfit import AnalysisResult, OutfitAnalysis, OutfitAnalysisCreate
+from services.analysis_cache import analysis_cache
+from services.gemini_service import gemini_service
+from services.outfit_service import outfit_service
+from services.similarity_service import similarity_service
+from services.upload_service import upload_service
+
+
+class AnalysisService:
+    @staticmethod
+    async def analyze(
+        filename: str,
+        image_digest: str,
+        occasion: Optional[str] = None,
+        weather: Optional[str] = None
+    ) -> AnalysisResult:
+        """
+        Analyze a stored upload without saving the result.
+
+        A previous analysis of the same image and context is reused when cached.
+        """
+        cache_key = analysis_cache.build_key(image_digest, occasion, weather)
+        analysis_result = await analysis_cache.get(cache_key)
+
+        if analysis_result is None:
+            # Analyze outfit using Gemini
+            async with upload_service.local_copy(filename) as image_path:
+                analysis_result = await gemini_service.analyze_outfit(image_path, occasion, weather)
+            if not gemini_service.is_default_analysis(analysis_result):
+                await analysis_cache.set(cache_key, analysis_result)
+
+        return analysis_result
+
+    @staticmethod
+    async def find_near_duplicate(user_id: str, features: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Return the id of an earlier analysis by the user of a nearly identical image.
+
+        Only informational, so failures are logged rather than raised.
+        """
+        if not features:
+            return None
+        try:
+            return await similarity_service.find_near_duplicate(user_id, features)
+        except Exception as e:
+            print(f"Error checking for near-duplicate uploads: {e}")
+            return None
+
+    async def analyze_and_store(
+        self,
+        user_id: str,
+        filename: str,
+        image_digest: str,
+        occasion: Optional[str] = None,
+        weather: Optional[str] = None,
+        image_variants: Sequence[str] = ()
+    ) -> OutfitAnalysis:
+        """
+        Analyze a stored upload and save the result.
+
+        Shared by the synchronous endpoint and the background job workers.
+        """
+        analysis_result = await self.analyze(filename, image_digest, occasion, weather)
+        features = await upload_service.get_features(filename)
+
+        # Save analysis to database
+        analysis_data = OutfitAnalysisCreate(
+            user_id=user_id,
+            image_filename=filename,
+            image_variants=list(image_variants),
+            analysis_result=analysis_result,
+            near_duplicate_of=await self.find_near_duplicate(user_id, features)
+        )
+
+        return await outfit_service.create_analysis(analysis_data, features)
+
+
+analysis_service = AnalysisService()
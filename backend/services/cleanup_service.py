@@ -0,0 +1,257 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from pymongo import ReturnDocument
+from config.database import get_database
+from config.settings import settings
+from models.job import JOB_TERMINAL_STATUSES
+from storage.base import CONTENT_TYPES
+from storage.factory import storage, upload_temp_dir
+from utils.file_utils import IMAGE_VARIANTS, upload_stem, variant_filename
+
+# How often cancel() checks whether a deletion in progress has finished
+CANCEL_POLL_SECONDS = 0.1
+
+
+def _sweep_directory(directory: str, cutoff: datetime) -> Dict[str, int]:
+    """Delete files last modified before cutoff (runs in a worker thread)."""
+    totals = {"deleted": 0, "bytes_reclaimed": 0}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return totals
+    for entry in entries:
+        try:
+            stat = entry.stat()
+            if not entry.is_file() or datetime.utcfromtimestamp(stat.st_mtime) >= cutoff:
+                continue
+            os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        totals["deleted"] += 1
+        totals["bytes_reclaimed"] += stat.st_size
+    return totals
+
+
+class CleanupService:
+    """
+    Background deletion of released uploads and of orphaned files.
+
+    UploadService.release queues an upload in the `storage_deletions`
+    collection once its last reference is gone, and a worker deletes its
+    files, retrying with backoff while the storage backend fails. Storing
+    the same image again cancels a queued deletion, or waits for one already
+    being carried out, so the files it writes are never deleted. A periodic
+    reconciler walks the whole storage listing and deletes files older than
+    STORAGE_ORPHAN_GRACE_SECONDS that no analysis or pending job references,
+    e.g. uploads of a request that died before its analysis was saved.
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.deleted = 0
+        self.failed = 0
+        self.last_reconcile: Optional[dict] = None
+
+    async def enqueue(self, key: str) -> None:
+        """Queue the files of an upload for deletion."""
+        db = await get_database()
+        now = datetime.utcnow()
+        await db.storage_deletions.update_one(
+            {"_id": key},
+            {"$setOnInsert": {"attempts": 0, "available_at": now, "created_at": now}},
+            upsert=True
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def cancel(self, key: str) -> None:
+        """
+        Cancel the queued deletion of an upload that is being stored again.
+
+        A deletion a worker has leased may already be removing files, so it
+        is waited for until it finishes or its lease runs out; the caller can
+        then write the files safely.
+        """
+        db = await get_database()
+        while True:
+            result = await db.storage_deletions.delete_one({
+                "_id": key,
+                "$or": [{"leased_until": None}, {"leased_until": {"$lte": datetime.utcnow()}}]
+            })
+            if result.deleted_count or await db.storage_deletions.find_one({"_id": key}, {"_id": 1}) is None:
+                return
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+
+    async def _claim(self) -> Optional[dict]:
+        """Atomically lease the next due deletion, if any."""
+        db = await get_database()
+        now = datetime.utcnow()
+        lease_end = now + timedelta(seconds=settings.STORAGE_DELETE_LEASE_SECONDS)
+        return await db.storage_deletions.find_one_and_update(
+            {"available_at": {"$lte": now}},
+            {
+                "$set": {"available_at": lease_end, "leased_until": lease_end},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    async def _delete_files(key: str) -> None:
+        for variant in IMAGE_VARIANTS:
+            await storage.delete(variant_filename(key, variant))
+        await storage.delete(key)
+
+    async def _process(self, deletion: dict) -> None:
+        db = await get_database()
+        key = deletion["_id"]
+        # Once the lease runs out, the record may belong to a newer release
+        leased = {"_id": key, "leased_until": deletion["leased_until"]}
+
+        # The same image was uploaded again after the release: keep its files.
+        # A store from here on waits in cancel() until this deletion is done.
+        if await db.stored_objects.find_one({"_id": key}, {"_id": 1}) is None:
+            try:
+                await self._delete_files(key)
+            except Exception as e:
+                print(f"Deleting upload {key} attempt {deletion['attempts']} failed: {e}")
+                if deletion["attempts"] < settings.STORAGE_DELETE_MAX_ATTEMPTS:
+                    backoff = settings.STORAGE_DELETE_RETRY_BACKOFF_SECONDS * 2 ** (deletion["attempts"] - 1)
+                    await db.storage_deletions.update_one(
+                        leased,
+                        {
+                            "$set": {"available_at": datetime.utcnow() + timedelta(seconds=backoff), "error": str(e)},
+                            "$unset": {"leased_until": ""}
+                        }
+                    )
+                    return
+                # Give up; the reconciler removes the files once the backend recovers
+                self.failed += 1
+            else:
+                self.deleted += 1
+
+        await db.storage_deletions.delete_one(leased)
+
+    async def _deletion_loop(self) -> None:
+        while True:
+            try:
+                deletion = await self._claim()
+            except Exception as e:
+                print(f"Error claiming upload deletion: {e}")
+                deletion = None
+
+            if deletion is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.STORAGE_DELETE_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._process(deletion)
+            except Exception as e:
+                print(f"Error processing upload deletion {deletion['_id']}: {e}")
+
+    async def _referenced_stems(self, stems: Iterable[str], cutoff: datetime) -> Set[str]:
+        """Return the stems whose upload is used by an analysis, a pending job or a recent store."""
+        # Objects are grouped by stem, so try every extension an original may have
+        keys = [f"{stem}{extension}" for stem in stems for extension in CONTENT_TYPES]
+        db = await get_database()
+        referenced = set()
+        queries = [
+            (db.outfit_analyses, {"image_filename": {"$in": keys}}, "image_filename"),
+            (db.analysis_jobs, {
+                "image_filename": {"$in": keys}, "status": {"$nin": list(JOB_TERMINAL_STATUSES)}
+            }, "image_filename"),
+            # Stored within the grace period, by a request that may still be running
+            (db.stored_objects, {"_id": {"$in": keys}, "updated_at": {"$gte": cutoff}}, "_id"),
+        ]
+        for collection, query, field in queries:
+            async for doc in collection.find(query, {field: 1}):
+                referenced.add(upload_stem(doc[field]))
+        return referenced
+
+    async def reconcile(self) -> dict:
+        """
+        Delete stored files that nothing references.
+
+        Files modified within the grace period are skipped, since their
+        upload may still be in progress. Returns the number of objects
+        scanned and deleted and the bytes reclaimed.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.STORAGE_ORPHAN_GRACE_SECONDS)
+        db = await get_database()
+        totals = {"scanned": 0, "deleted": 0, "bytes_reclaimed": 0}
+
+        async for batch in storage.list_objects():
+            totals["scanned"] += len(batch)
+            candidates: Dict[str, list] = {}
+            for obj in batch:
+                if obj.modified_at < cutoff:
+                    candidates.setdefault(upload_stem(obj.key), []).append(obj)
+            if not candidates:
+                continue
+
+            referenced = await self._referenced_stems(candidates, cutoff)
+            for stem, objects in candidates.items():
+                if stem in referenced:
+                    continue
+                for obj in objects:
+                    if await storage.delete(obj.key):
+                        totals["deleted"] += 1
+                        totals["bytes_reclaimed"] += obj.size
+                # Drop the record a crashed request left behind, unless it was stored again since
+                await db.stored_objects.delete_many({
+                    "_id": {"$in": [f"{stem}{extension}" for extension in CONTENT_TYPES]},
+                    "updated_at": {"$not": {"$gte": cutoff}}
+                })
+
+        # Uploads being spooled when a process died
+        swept = await asyncio.to_thread(_sweep_directory, upload_temp_dir(), cutoff)
+        totals["deleted"] += swept["deleted"]
+        totals["bytes_reclaimed"] += swept["bytes_reclaimed"]
+
+        self.last_reconcile = {**totals, "finished_at": datetime.utcnow().isoformat()}
+        return totals
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.STORAGE_RECONCILE_INTERVAL_SECONDS)
+            try:
+                totals = await self.reconcile()
+                print(
+                    f"Upload reconciliation scanned {totals['scanned']} objects, deleted "
+                    f"{totals['deleted']} orphans and reclaimed {totals['bytes_reclaimed']} bytes"
+                )
+            except Exception as e:
+                print(f"Error reconciling uploads: {e}")
+
+    def start(self) -> None:
+        """Start the deletion worker and, unless disabled, the periodic reconciler."""
+        self._wakeup = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._deletion_loop()))
+        if settings.STORAGE_RECONCILE_INTERVAL_SECONDS > 0:
+            self._tasks.append(asyncio.create_task(self._reconcile_loop()))
+
+    async def stop(self) -> None:
+        """Stop the background tasks; leased deletions are picked up again after their lease."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, object]:
+        """Return deletion counters and the outcome of the last reconciliation."""
+        return {
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "last_reconcile": self.last_reconcile,
+        }
+
+
+cleanup_service = CleanupService()
@@ -1,8 +1,119 @@
-from typing import List, Optional
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 from bson import ObjectId
-from models.closet import ClosetItem, ClosetItemCreate, ClosetItemUpdate
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from models.closet import (
+    BulkItemError, ClosetBulkResult, ClosetFacets, ClosetFilter, ClosetImportResult, ClosetItem,
+    ClosetItemBulkUpdate, ClosetItemCreate, ClosetItemSummary, ClosetItemUpdate, FacetCount
+)
 from config.database import get_database
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.pagination import KEYSET_SORT, keyset_filter, next_cursor
+from utils.streaming import LineTooLongError
+
+# Content types accepted by import_items, and the format each one selects
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+}
+
+# Fields loaded for the closet grid; see ClosetItemSummary
+GRID_PROJECTION = {field: 1 for field in ClosetItemSummary.model_fields if field != "id"}
+
+# Separator of the values in the tags column of a CSV import
+CSV_TAG_SEPARATOR = ";"
+
+
+def _validation_detail(e: ValidationError) -> str:
+    """Summarize a pydantic ValidationError in one line."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+        for error in e.errors()
+    )
+
+
+def _write_errors(e: BulkWriteError) -> Dict[int, str]:
+    """Map the index of each failed operation of a bulk write to its error message."""
+    return {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+
+
+def _csv_row(record: List[str]) -> List[str]:
+    """Parse one CSV record, given as its physical lines (several if a quoted field spans lines)."""
+    # The line breaks inside quoted fields are part of their values
+    return next(csv.reader(line + "\n" for line in record))
+
+
+def _csv_in_quotes(line: str, in_quotes: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field after this physical line.
+    
+    Follows the csv module: a quote opens a field only as its first
+    character, elsewhere it is kept as text, and inside a quoted field a
+    doubled quote stands for itself.
+    """
+    if '"' not in line:
+        return in_quotes
+    field_start = not in_quotes
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if in_quotes:
+            if ch == '"':
+                if line.startswith('"', i + 1):
+                    i += 1
+                else:
+                    in_quotes = False
+        elif ch == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and ch == ","
+        i += 1
+    return in_quotes
+
+
+def _csv_header(record: List[str]) -> List[str]:
+    """Parse the header row of a CSV import. Raises ValueError if a required field is missing."""
+    header = [column.strip().lower() for column in _csv_row(record)]
+    missing = [field for field in ("name", "category", "color") if field not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing: {', '.join(missing)}")
+    return header
+
+
+def _csv_item(header: List[str], row: List[str]) -> Dict[str, Any]:
+    """Turn a CSV row into closet item fields; blank cells are left out."""
+    if len(row) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(row)}")
+    item = {column: value.strip() for column, value in zip(header, row) if value.strip()}
+    if "tags" in item:
+        item["tags"] = [tag.strip() for tag in item["tags"].split(CSV_TAG_SEPARATOR) if tag.strip()]
+    return item
+
+
+# Facet counts per user, dropped on every write to that user's closet
+facets_cache = TTLCache(settings.CLOSET_FACETS_CACHE_MAX_ENTRIES, settings.CLOSET_FACETS_CACHE_TTL_SECONDS)
+# Bumped on every write, so counts computed across a write are not cached
+_closet_writes = 0
+
+
+def _invalidate_facets(user_id: str) -> None:
+    global _closet_writes
+    _closet_writes += 1
+    facets_cache.pop(user_id)
+
+
+def _facet_counts(field: str) -> List[Dict[str, Any]]:
+    """$facet pipeline counting the values of field, most common first."""
+    return [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+
 
 class ClosetService:
     @staticmethod
@@ -15,16 +126,364 @@ class ClosetService:
         new_item["updated_at"] = datetime.utcnow()
         
         result = await db.closet.insert_one(new_item)
+        _invalidate_facets(user_id)
         new_item["_id"] = result.inserted_id
         
         return ClosetItem(**new_item)
 
     @staticmethod
-    async def get_user_closet(user_id: str) -> List[ClosetItem]:
+    async def _insert_many(user_id: str, rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[ClosetItem], List[BulkItemError]]:
+        """
+        Validate raw items and insert the valid ones in one insert_many.
+        
+        rows pairs each item with the index reported in its error, if any.
+        """
+        errors = []
+        indexes, docs = [], []
+        now = datetime.utcnow()
+        for index, raw in rows:
+            try:
+                item = ClosetItemCreate.model_validate(raw)
+            except ValidationError as e:
+                errors.append(BulkItemError(index=index, detail=_validation_detail(e)))
+                continue
+            doc = item.model_dump()
+            doc.update(user_id=user_id, created_at=now, updated_at=now)
+            indexes.append(index)
+            docs.append(doc)
+        
+        if not docs:
+            return [], errors
+        
+        db = await get_database()
+        failed = {}
+        try:
+            # insert_many sets the _id of each doc, including those of a failed batch
+            await db.closet.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = _write_errors(e)
+        _invalidate_facets(user_id)
+        
+        created = []
+        for position, (index, doc) in enumerate(zip(indexes, docs)):
+            if position in failed:
+                errors.append(BulkItemError(index=index, detail=failed[position]))
+            else:
+                created.append(ClosetItem(**doc))
+        return created, errors
+
+    @staticmethod
+    async def create_items(user_id: str, raw_items: List[Dict[str, Any]]) -> ClosetBulkResult:
+        """Create many items at once; invalid items are reported by their index."""
+        created, errors = await ClosetService._insert_many(user_id, list(enumerate(raw_items)))
+        return ClosetBulkResult(items=created, errors=sorted(errors, key=lambda error: error.index))
+
+    @staticmethod
+    async def update_items(user_id: str, raw_items: List[Dict[str, Any]]) -> ClosetBulkResult:
+        """
+        Update many items with one bulk_write, then read them back with one find.
+        
+        Each raw item carries the `id` of the item to update and the fields to
+        change. Invalid, duplicate and unknown ids are reported by index.
+        """
+        errors = []
+        requested: Dict[ObjectId, int] = {}
+        operations, operation_ids = [], []
+        now = datetime.utcnow()
+        for index, raw in enumerate(raw_items):
+            try:
+                update = ClosetItemBulkUpdate.model_validate(raw)
+            except ValidationError as e:
+                errors.append(BulkItemError(index=index, id=raw.get("id"), detail=_validation_detail(e)))
+                continue
+            if not ObjectId.is_valid(update.id):
+                errors.append(BulkItemError(index=index, id=update.id, detail="Invalid item id"))
+                continue
+            item_id = ObjectId(update.id)
+            if item_id in requested:
+                errors.append(BulkItemError(index=index, id=update.id, detail="Duplicate item id"))
+                continue
+            
+            requested[item_id] = index
+            update_dict = {k: v for k, v in update.model_dump(exclude={"id"}).items() if v is not None}
+            if update_dict:
+                update_dict["updated_at"] = now
+                operations.append(UpdateOne({"_id": item_id, "user_id": user_id}, {"$set": update_dict}))
+                operation_ids.append(item_id)
+        
         db = await get_database()
-        cursor = db.closet.find({"user_id": user_id}).sort("created_at", -1)
-        items = await cursor.to_list(length=1000)
-        return [ClosetItem(**item) for item in items]
+        failed = set()
+        if operations:
+            try:
+                await db.closet.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for position, message in _write_errors(e).items():
+                    item_id = operation_ids[position]
+                    failed.add(item_id)
+                    errors.append(BulkItemError(index=requested[item_id], id=str(item_id), detail=message))
+            _invalidate_facets(user_id)
+        
+        found = {}
+        if requested:
+            cursor = db.closet.find({"_id": {"$in": list(requested)}, "user_id": user_id})
+            found = {item["_id"]: item async for item in cursor}
+        
+        updated = []
+        for item_id, index in requested.items():
+            if item_id in failed:
+                continue
+            if item_id not in found:
+                errors.append(BulkItemError(index=index, id=str(item_id), detail="Item not found"))
+                continue
+            updated.append(ClosetItem(**found[item_id]))
+        return ClosetBulkResult(items=updated, errors=sorted(errors, key=lambda error: error.index))
+
+    @staticmethod
+    async def delete_items(user_id: str, item_ids: List[str]) -> ClosetBulkResult:
+        """Delete many items with one delete_many; unknown ids are reported by index."""
+        errors = []
+        requested: Dict[ObjectId, int] = {}
+        for index, item_id in enumerate(item_ids):
+            if not ObjectId.is_valid(item_id):
+                errors.append(BulkItemError(index=index, id=item_id, detail="Invalid item id"))
+            elif ObjectId(item_id) in requested:
+                errors.append(BulkItemError(index=index, id=item_id, detail="Duplicate item id"))
+            else:
+                requested[ObjectId(item_id)] = index
+        
+        deleted = []
+        if requested:
+            db = await get_database()
+            query = {"_id": {"$in": list(requested)}, "user_id": user_id}
+            existing = {item["_id"] async for item in db.closet.find(query, {"_id": 1})}
+            if existing:
+                await db.closet.delete_many({"_id": {"$in": list(existing)}, "user_id": user_id})
+                _invalidate_facets(user_id)
+            for item_id, index in requested.items():
+                if item_id in existing:
+                    deleted.append(str(item_id))
+                else:
+                    errors.append(BulkItemError(index=index, id=str(item_id), detail="Item not found"))
+        return ClosetBulkResult(deleted_ids=deleted, errors=sorted(errors, key=lambda error: error.index))
+
+    @staticmethod
+    async def import_items(user_id: str, lines: AsyncIterator[bytes], file_format: str) -> ClosetImportResult:
+        """
+        Import items from a CSV or JSON-lines stream.
+        
+        Lines are parsed as they arrive and written in batches of
+        CLOSET_IMPORT_BATCH_SIZE, so only one batch is held in memory. CSV
+        input needs a header row naming the item fields, with tags separated
+        by CSV_TAG_SEPARATOR; quoted fields may span lines. Bad records are
+        reported by the number of their first line and skipped. Raises
+        ValueError if the CSV header lacks a required field.
+        """
+        result = ClosetImportResult()
+        
+        def record(errors: List[BulkItemError]) -> None:
+            result.error_count += len(errors)
+            room = settings.CLOSET_IMPORT_MAX_ERRORS - len(result.errors)
+            result.errors.extend(errors[:max(room, 0)])
+        
+        async def flush(batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+            created, errors = await ClosetService._insert_many(user_id, batch)
+            result.imported += len(created)
+            record(errors)
+            batch.clear()
+        
+        header = None
+        batch = []
+        line_number = 0
+        # Physical lines of the current CSV record; a quoted field may span several
+        pending: List[str] = []
+        record_start = record_bytes = 0
+        in_quotes = False
+        decode_error = None
+        try:
+            async for line in lines:
+                line_number += 1
+                # Spreadsheet exports often start with a byte order mark
+                encoding = "utf-8-sig" if line_number == 1 else "utf-8"
+                try:
+                    text = line.decode(encoding)
+                except UnicodeDecodeError as e:
+                    if file_format != "csv":
+                        record([BulkItemError(index=line_number, detail=str(e))])
+                        continue
+                    # Keep reading the record so its quotes still pair up, then skip it
+                    text = line.decode(encoding, errors="replace")
+                    decode_error = decode_error or str(e)
+                if not pending and not text.strip():
+                    continue
+                
+                index = line_number
+                if file_format == "csv":
+                    if not pending:
+                        record_start, record_bytes = line_number, 0
+                    pending.append(text)
+                    record_bytes += len(line) + 1
+                    if record_bytes > settings.CLOSET_IMPORT_MAX_LINE_BYTES:
+                        raise LineTooLongError(f"Record longer than {settings.CLOSET_IMPORT_MAX_LINE_BYTES} bytes")
+                    in_quotes = _csv_in_quotes(text, in_quotes)
+                    if in_quotes:
+                        continue
+                    index, csv_record, pending = record_start, pending, []
+                    if decode_error:
+                        record([BulkItemError(index=index, detail=decode_error)])
+                        decode_error = None
+                        continue
+                    if header is None:
+                        header = _csv_header(csv_record)
+                        continue
+                
+                try:
+                    if header is not None:
+                        raw = _csv_item(header, _csv_row(csv_record))
+                    else:
+                        raw = json.loads(text)
+                        if not isinstance(raw, dict):
+                            raise ValueError("Expected a JSON object")
+                except (csv.Error, ValueError) as e:
+                    record([BulkItemError(index=index, detail=str(e))])
+                    continue
+                
+                batch.append((index, raw))
+                if len(batch) >= settings.CLOSET_IMPORT_BATCH_SIZE:
+                    await flush(batch)
+        except LineTooLongError as e:
+            # Without a line break there is no telling where the next item starts
+            record([BulkItemError(index=record_start if pending else line_number + 1, detail=f"{e}; import stopped")])
+            pending = []
+        
+        if pending:
+            record([BulkItemError(index=record_start, detail="Unterminated quoted field")])
+        
+        if batch:
+            await flush(batch)
+        return result
+
+    @staticmethod
+    def _closet_query(user_id: str, closet_filter: ClosetFilter, cursor: Optional[str]) -> Dict[str, Any]:
+        """Build the query for a page of a user's closet. Raises ValueError for a malformed cursor."""
+        query: Dict[str, Any] = {"user_id": user_id}
+        if closet_filter.category:
+            query["category"] = closet_filter.category
+        if closet_filter.color:
+            query["color"] = closet_filter.color
+        if closet_filter.tags:
+            query["tags"] = {"$all": closet_filter.tags}
+        query.update(keyset_filter(cursor))
+        return query
+
+    @staticmethod
+    async def _find_page(query: Dict[str, Any], limit: int, projection: Optional[Dict[str, int]] = None) -> Tuple[List[dict], Optional[str]]:
+        db = await get_database()
+        cursor = db.closet.find(query, projection).sort(KEYSET_SORT).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        return docs, next_cursor(docs, limit)
+
+    @staticmethod
+    async def get_user_closet(
+        user_id: str,
+        closet_filter: ClosetFilter = ClosetFilter(),
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        view: str = "full"
+    ) -> Tuple[List[Union[ClosetItem, ClosetItemSummary]], Optional[str]]:
+        """
+        Get a page of a user's closet, newest first.
+        
+        With view="grid" only the fields of ClosetItemSummary are loaded.
+        Returns the items and the cursor of the next page.
+        Raises ValueError for a malformed cursor.
+        """
+        query = ClosetService._closet_query(user_id, closet_filter, cursor)
+        if view == "grid":
+            docs, cursor_after = await ClosetService._find_page(query, limit, GRID_PROJECTION)
+            return [ClosetItemSummary(**doc) for doc in docs], cursor_after
+        docs, cursor_after = await ClosetService._find_page(query, limit)
+        return [ClosetItem(**doc) for doc in docs], cursor_after
+
+    @staticmethod
+    async def get_user_closet_versions(
+        user_id: str,
+        closet_filter: ClosetFilter = ClosetFilter(),
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> List[tuple]:
+        """Get (id, updated_at) of every item on the page get_user_closet would return."""
+        query = ClosetService._closet_query(user_id, closet_filter, cursor)
+        docs, _ = await ClosetService._find_page(query, limit, {"created_at": 1, "updated_at": 1})
+        return [(str(doc["_id"]), doc.get("updated_at")) for doc in docs]
+
+    @staticmethod
+    async def search_items(
+        user_id: str,
+        text: str,
+        limit: int = 20,
+        skip: int = 0,
+        view: str = "full"
+    ) -> List[Union[ClosetItem, ClosetItemSummary]]:
+        """
+        Full-text search over the name, description and tags of a user's items.
+        
+        Items are ranked by text relevance, with name matches weighted
+        highest (see the closet text index). Terms are matched by stem, so
+        "shirts" finds "shirt"; an item matching more terms ranks higher.
+        """
+        db = await get_database()
+        score = {"score": {"$meta": "textScore"}}
+        projection = {**GRID_PROJECTION, **score} if view == "grid" else score
+        cursor = db.closet.find(
+            {"user_id": user_id, "$text": {"$search": text}},
+            projection
+        ).sort([("score", {"$meta": "textScore"}), ("_id", -1)]).skip(skip).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        model = ClosetItemSummary if view == "grid" else ClosetItem
+        return [model(**doc) for doc in docs]
+
+    @staticmethod
+    async def get_facets(user_id: str) -> ClosetFacets:
+        """
+        Count a user's items per category, color and tag in one $facet aggregation.
+        
+        Counts are cached per user until the next write to their closet.
+        The cache is per process, so other processes may serve counts up to
+        CLOSET_FACETS_CACHE_TTL_SECONDS old.
+        """
+        cached = facets_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        writes = _closet_writes
+        db = await get_database()
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "categories": _facet_counts("category"),
+                "colors": _facet_counts("color"),
+                "tags": [
+                    {"$unwind": "$tags"},
+                    *_facet_counts("tags"),
+                    {"$limit": settings.CLOSET_FACET_TAG_LIMIT},
+                ],
+            }},
+        ]
+        result = (await db.closet.aggregate(pipeline).to_list(length=1))[0]
+        
+        def counts(name: str) -> List[FacetCount]:
+            return [FacetCount(value=str(doc["_id"]), count=doc["count"]) for doc in result[name]]
+        
+        facets = ClosetFacets(
+            total=result["total"][0]["count"] if result["total"] else 0,
+            categories=counts("categories"),
+            colors=counts("colors"),
+            tags=counts("tags"),
+        )
+        if writes == _closet_writes:
+            facets_cache.set(user_id, facets)
+        return facets
 
     @staticmethod
     async def get_item(item_id: str, user_id: str) -> Optional[ClosetItem]:
@@ -44,17 +503,19 @@ class ClosetService:
             
         update_dict["updated_at"] = datetime.utcnow()
         
-        result = await db.closet.update_one(
+        item = await db.closet.find_one_and_update(
             {"_id": ObjectId(item_id), "user_id": user_id},
-            {"$set": update_dict}
+            {"$set": update_dict},
+            return_document=ReturnDocument.AFTER
         )
-        
-        if result.modified_count > 0:
-            return await ClosetService.get_item(item_id, user_id)
+        _invalidate_facets(user_id)
+        if item:
+            return ClosetItem(**item)
         return None
 
     @staticmethod
     async def delete_item(item_id: str, user_id: str) -> bool:
         db = await get_database()
         result = await db.closet.delete_one({"_id": ObjectId(item_id), "user_id": user_id})
+        _invalidate_facets(user_id)
         return result.deleted_count > 0
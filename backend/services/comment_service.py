@@ -0,0 +1,80 @@
+from typing import List, Optional, Tuple
+from datetime import datetime
+from bson import ObjectId
+from config.database import get_database
+from models.outfit import Comment
+from utils.pagination import KEYSET_SORT, keyset_filter, next_cursor
+
+
+class CommentService:
+    """
+    Comments on outfit analyses, stored one per document in `outfit_comments`.
+    
+    The analysis only keeps a `comment_count`, so reading an analysis never
+    pulls in its thread.
+    """
+
+    @staticmethod
+    async def add_comment(analysis_id: str, user_id: str, username: str, text: str) -> Optional[Comment]:
+        """Add a comment, or return None if the analysis does not exist."""
+        db = await get_database()
+        
+        # Count first: a comment is never stored against a missing analysis
+        now = datetime.utcnow()
+        result = await db.outfit_analyses.update_one(
+            {"_id": ObjectId(analysis_id)},
+            {"$inc": {"comment_count": 1}, "$set": {"updated_at": now}}
+        )
+        if result.matched_count == 0:
+            return None
+        
+        comment = {
+            "analysis_id": analysis_id,
+            "user_id": user_id,
+            "username": username,
+            "text": text,
+            "created_at": now
+        }
+        try:
+            inserted = await db.outfit_comments.insert_one(comment)
+        except Exception:
+            await db.outfit_analyses.update_one(
+                {"_id": ObjectId(analysis_id)},
+                {"$inc": {"comment_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+            )
+            raise
+        
+        comment["_id"] = str(inserted.inserted_id)
+        return Comment(**comment)
+
+    @staticmethod
+    async def get_comments(
+        analysis_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Comment], Optional[str]]:
+        """
+        Get a page of comments on an analysis, newest first.
+        
+        Returns the comments and the cursor for the next (older) page, which
+        is None on the last page. Raises ValueError for a malformed cursor.
+        """
+        query = {"analysis_id": analysis_id, **keyset_filter(cursor)}
+        db = await get_database()
+        comments = await db.outfit_comments.find(query).sort(KEYSET_SORT).limit(limit + 1).to_list(length=limit + 1)
+        cursor_after = next_cursor(comments, limit)
+        
+        for comment in comments:
+            comment["_id"] = str(comment["_id"])
+        
+        return [Comment(**comment) for comment in comments], cursor_after
+
+    @staticmethod
+    async def delete_for_analysis(analysis_id: str) -> int:
+        """Delete every comment on an analysis."""
+        db = await get_database()
+        result = await db.outfit_comments.delete_many({"analysis_id": analysis_id})
+        return result.deleted_count
+
+
+comment_service = CommentService()
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Awaitable, Callable, FrozenSet, Hashable, NamedTuple, Optional, Tuple
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.http_cache import make_etag
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+    analysis_ids: FrozenSet[str]
+
+
+# A page builder returns the serialized body, the ids of the analyses on the
+# page and the cursor of the page after it
+PageBuilder = Callable[[], Awaitable[Tuple[bytes, FrozenSet[str], Optional[str]]]]
+
+
+class FeedCache:
+    """
+    Pre-serialized pages of the anonymous community feed.
+    
+    Only the first FEED_CACHE_PAGES pages are cached, whether reached with
+    skip or by following next_cursor from a cached page. Concurrent misses
+    for the same page share one database query. Entries expire after
+    FEED_CACHE_TTL_SECONDS, which also bounds how stale another worker
+    process's copy can be; within this process, changes invalidate pages
+    directly.
+    """
+
+    def __init__(self):
+        self._pages = TTLCache(settings.FEED_CACHE_MAX_ENTRIES, settings.FEED_CACHE_TTL_SECONDS)
+        # (limit, cursor) -> depth of the page that cursor starts
+        self._cursor_depths = TTLCache(settings.FEED_CACHE_MAX_ENTRIES, settings.FEED_CACHE_TTL_SECONDS)
+        self._pending = {}
+        # Bumped by every invalidation so builds started before it are not stored
+        self._generation = 0
+
+    def page_depth(self, limit: int, skip: int, cursor: Optional[str]) -> Optional[int]:
+        """Return the page number of a request if it is cacheable, else None."""
+        if cursor:
+            return self._cursor_depths.get((limit, cursor))
+        if skip % limit or skip // limit >= settings.FEED_CACHE_PAGES:
+            return None
+        return skip // limit
+
+    async def get_page(self, key: Hashable, depth: int, limit: int, build: PageBuilder) -> CachedPage:
+        """Return the cached page for key, building it once if missing."""
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._build(key, depth, limit, build))
+            self._pending[key] = pending
+        # A disconnecting client must not cancel a build others are waiting on
+        return await asyncio.shield(pending)
+
+    async def _build(self, key: Hashable, depth: int, limit: int, build: PageBuilder) -> CachedPage:
+        generation = self._generation
+        try:
+            body, analysis_ids, cursor_after = await build()
+            page = CachedPage(body, make_etag(body), analysis_ids)
+            if generation == self._generation:
+                self._pages.set(key, page)
+                if cursor_after and depth + 1 < settings.FEED_CACHE_PAGES:
+                    self._cursor_depths.set((limit, cursor_after), depth + 1)
+            return page
+        finally:
+            self._pending.pop(key, None)
+
+    def invalidate_analysis(self, analysis_id: str) -> None:
+        """Drop the pages showing an analysis, e.g. after its counts changed."""
+        self._generation += 1
+        self._pages.pop_matching(lambda page: analysis_id in page.analysis_ids)
+
+    def invalidate_all(self) -> None:
+        """Drop every page, e.g. after an analysis entered or left the feed."""
+        self._generation += 1
+        self._pages.clear()
+        self._cursor_depths.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        return self._pages.stats()
+
+
+feed_cache = FeedCache()
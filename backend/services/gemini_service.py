@@ -1,17 +1,139 @@
+import asyncio
+import threading
 import google.generativeai as genai
-from PIL import Image
-import json
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, Optional, Tuple, Type
+from pydantic import ValidationError
 from config.settings import settings
 from models.outfit import AnalysisResult
+from utils.concurrency import BoundedExecutor, ExecutorBusyError, ExecutorTimeoutError
+from utils.image_utils import image_executor, prepare_model_image
+from utils.resilience import (
+    CircuitBreaker, CircuitOpenError, ResilientCaller, UpstreamUnavailableError, is_retryable
+)
+from utils.structured_output import OutputParseError, parse_json, response_schema
 
 # Configure Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+GEMINI_MODEL_NAME = 'models/gemini-2.5-flash'
+
+# Bump whenever the analysis prompt or its expected output changes so cached
+# analyses produced by the old prompt are no longer served
+PROMPT_VERSION = "1"
+
+DEFAULT_STYLE_DESCRIPTION = "Unable to analyze the outfit at this time. Please try again."
+
+# Marks the end of a streamed chat response
+_STREAM_END = object()
+
+
+def _cancel_stream(response) -> None:
+    """Cancel the underlying gRPC stream of a streaming response, if still open."""
+    # The SDK does not expose cancellation, but its iterator is the gRPC call
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None)
+    if cancel is not None:
+        cancel()
+
+
+# Model calls are blocking, so they run on a dedicated bounded pool
+# instead of the event loop
+gemini_executor = BoundedExecutor(
+    "gemini",
+    max_in_flight=settings.GEMINI_MAX_IN_FLIGHT,
+    max_queue=settings.GEMINI_MAX_QUEUE,
+    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+)
+
+# Errors that mean the model cannot be used right now, as opposed to a bad request
+MODEL_UNAVAILABLE_ERRORS: Tuple[Type[Exception], ...] = (
+    ExecutorBusyError, ExecutorTimeoutError, CircuitOpenError, UpstreamUnavailableError
+)
+
+
+def _upstream_failure(e: BaseException) -> bool:
+    """Errors that count against the circuit breaker: transient ones and timeouts."""
+    return is_retryable(e) or isinstance(e, ExecutorTimeoutError)
+
+
+def create_model_caller() -> ResilientCaller:
+    """Build the retry/circuit breaker/hedging policy for model calls from settings."""
+    return ResilientCaller(
+        "gemini",
+        max_attempts=settings.GEMINI_RETRY_MAX_ATTEMPTS,
+        base_delay=settings.GEMINI_RETRY_BASE_DELAY_SECONDS,
+        max_delay=settings.GEMINI_RETRY_MAX_DELAY_SECONDS,
+        breaker=CircuitBreaker(
+            "gemini",
+            failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+            reset_seconds=settings.GEMINI_BREAKER_RESET_SECONDS
+        ),
+        hedge=settings.GEMINI_HEDGE_ENABLED,
+        hedge_min_delay=settings.GEMINI_HEDGE_MIN_DELAY_SECONDS,
+        hedge_min_samples=settings.GEMINI_HEDGE_MIN_SAMPLES,
+        latency_window=settings.GEMINI_LATENCY_WINDOW,
+        failure=_upstream_failure
+    )
+
 
 class GeminiService:
-    def __init__(self):
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+    def __init__(self, model: Any = None, caller: Optional[ResilientCaller] = None):
+        # Both can be injected, e.g. a fake model exposing generate_content
+        self.model = model if model is not None else genai.GenerativeModel(GEMINI_MODEL_NAME)
+        self.caller = caller if caller is not None else create_model_caller()
+        self.image_stats = {
+            "images": 0,
+            "original_bytes": 0,
+            "model_bytes": 0,
+            "preprocess_ms": 0.0
+        }
+        # Constrain analyses to the AnalysisResult schema instead of asking for JSON in prose
+        self.analysis_config = {
+            "response_mime_type": "application/json",
+            "response_schema": response_schema(AnalysisResult)
+        } if settings.GEMINI_STRUCTURED_OUTPUT else None
+        self.output_stats = {
+            "responses": 0,
+            "repaired": 0,
+            "malformed": 0,
+            "retries": 0,
+            "failed": 0
+        }
+    
+    async def _generate(self, contents: Any, **kwargs) -> Any:
+        """
+        Call the model on the Gemini pool, with retries, circuit breaking
+        and hedging as configured.
+        """
+        return await self.caller.call(
+            lambda: gemini_executor.run(self.model.generate_content, contents, **kwargs)
+        )
+    
+    async def _prepare_image(self, image_path: str) -> dict:
+        """
+        Downscale and re-encode an upload in the image pool.
+        
+        The original file is left untouched for display; the model only
+        ever receives this compact derivative.
+        """
+        data, stats = await image_executor.run(
+            prepare_model_image,
+            image_path,
+            settings.MODEL_IMAGE_MAX_EDGE,
+            settings.MODEL_IMAGE_QUALITY
+        )
+        
+        self.image_stats["images"] += 1
+        self.image_stats["original_bytes"] += stats["original_bytes"]
+        self.image_stats["model_bytes"] += stats["model_bytes"]
+        self.image_stats["preprocess_ms"] += stats["elapsed_ms"]
+        saved_kb = (stats["original_bytes"] - stats["model_bytes"]) / 1024
+        print(
+            f"Prepared model image {stats['original_size']} -> {stats['model_size']}, "
+            f"saved {saved_kb:.0f}KB in {stats['elapsed_ms']}ms"
+        )
+        
+        return {"mime_type": "image/jpeg", "data": data}
     
     async def analyze_outfit(self, image_path: str, occasion: str = None, weather: str = None) -> AnalysisResult:
         """
@@ -27,7 +149,7 @@ class GeminiService:
         """
         try:
             # Open and prepare image
-            img = Image.open(image_path)
+            img = await self._prepare_image(image_path)
             
             occasion_context = ""
             if occasion:
@@ -84,40 +206,55 @@ Return ONLY a valid JSON object (no markdown, no code blocks, no additional text
 
 Be specific, professional, and helpful. The rating should be between 1-10. If weather context is not provided, you MUST set weather_suitability to null."""
 
-            # Generate response
-            response = self.model.generate_content([prompt, img])
-            
-            # Parse JSON response
-            response_text = response.text.strip()
-            print(f"DEBUG: Gemini raw response: {response_text}")
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            response_text = response_text.strip()
-            
-            # Parse JSON
-            analysis_data = json.loads(response_text)
-            
-            # Validate and create AnalysisResult
-            analysis_result = AnalysisResult(**analysis_data)
-            
-            return analysis_result
+            # Malformed output is repaired if possible and only then asked for again
+            attempts = 1 + settings.GEMINI_OUTPUT_RETRIES
+            for attempt in range(attempts):
+                response = await self._generate([prompt, img], generation_config=self.analysis_config)
+                analysis_result = self._parse_analysis(response.text)
+                if analysis_result is not None:
+                    return analysis_result
+                if attempt + 1 < attempts:
+                    self.output_stats["retries"] += 1
             
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, return a default response
-            print(f"JSON parsing error: {e}")
-            print(f"Response text: {response_text}")
+            self.output_stats["failed"] += 1
             return self._create_default_analysis()
+            
+        except MODEL_UNAVAILABLE_ERRORS:
+            raise
         except Exception as e:
             print(f"Error analyzing outfit: {e}")
             raise Exception(f"Failed to analyze outfit: {str(e)}")
     
+    def _parse_analysis(self, response_text: str) -> Optional[AnalysisResult]:
+        """
+        Parse and validate a model response, repairing almost-JSON.
+        
+        Returns None, after logging the response, if it cannot be salvaged.
+        """
+        self.output_stats["responses"] += 1
+        try:
+            analysis_data, repaired = parse_json(response_text)
+            analysis_result = AnalysisResult.model_validate(analysis_data)
+        except (OutputParseError, ValidationError) as e:
+            self.output_stats["malformed"] += 1
+            print(f"Malformed analysis output: {e}")
+            print(f"Response text: {response_text}")
+            return None
+        
+        if repaired:
+            self.output_stats["repaired"] += 1
+            print("Repaired malformed analysis output")
+        return analysis_result
+    
+    def structured_output_stats(self) -> Dict[str, Any]:
+        """Return output parsing counters with repair and failure rates per response."""
+        responses = self.output_stats["responses"]
+        return {
+            **self.output_stats,
+            "repair_rate": round(self.output_stats["repaired"] / responses, 4) if responses else 0.0,
+            "failure_rate": round(self.output_stats["malformed"] / responses, 4) if responses else 0.0
+        }
+    
     def _create_default_analysis(self) -> AnalysisResult:
         """Create a default analysis response when API fails."""
         return AnalysisResult(
@@ -129,7 +266,7 @@ Be specific, professional, and helpful. The rating should be between 1-10. If we
                     "description": "Analysis failed"
                 }
             ],
-            style_description="Unable to analyze the outfit at this time. Please try again.",
+            style_description=DEFAULT_STYLE_DESCRIPTION,
             compliment="We couldn't fully analyze the details, but thanks for uploading!",
             outfit_rating={
                 "score": 5.0,
@@ -146,23 +283,26 @@ Be specific, professional, and helpful. The rating should be between 1-10. If we
         )
 
 
-    async def chat_with_stylist(self, analysis_context: Dict[str, Any], chat_history: list, user_message: str) -> str:
-        """
-        Chat with AI stylist about specific outfit analysis.
-        """
-        try:
-            # Construct context string from analysis result
-            context_str = f"""
+    @staticmethod
+    def is_default_analysis(result: AnalysisResult) -> bool:
+        """Check whether a result is the placeholder returned when parsing failed."""
+        return result.style_description == DEFAULT_STYLE_DESCRIPTION
+
+    @staticmethod
+    def _build_chat_prompt(analysis_context: Dict[str, Any], chat_history: list, user_message: str) -> str:
+        """Build the stylist prompt from the analysis context and conversation."""
+        # Construct context string from analysis result
+        context_str = f"""
             Context - Outfit Analysis:
             Style: {analysis_context.get('style_description', 'N/A')}
             Items: {', '.join([item.get('name', 'item') for item in analysis_context.get('detected_outfit_items', [])])}
             Rating: {analysis_context.get('outfit_rating', {}).get('score', 'N/A')}/10
             """
 
-            # Format history
-            history_str = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in chat_history])
+        # Format history
+        history_str = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in chat_history])
 
-            prompt = f"""You are a professional, helpful, and friendly AI fashion stylist. 
+        return f"""You are a professional, helpful, and friendly AI fashion stylist. 
             You are discussing a specific outfit with a user. Use the analysis context below to answer their questions.
             
             {context_str}
@@ -173,15 +313,82 @@ Be specific, professional, and helpful. The rating should be between 1-10. If we
             User: {user_message}
             AI Stylist:"""
 
-            response = self.model.generate_content(prompt)
+    async def chat_with_stylist(self, analysis_context: Dict[str, Any], chat_history: list, user_message: str) -> str:
+        """
+        Chat with AI stylist about specific outfit analysis.
+        """
+        try:
+            prompt = self._build_chat_prompt(analysis_context, chat_history, user_message)
+
+            response = await self._generate(prompt)
             return response.text
             
+        except MODEL_UNAVAILABLE_ERRORS:
+            raise
         except Exception as e:
             import traceback
             traceback.print_exc()
             print(f"Error in chat: {e}")
             return f"Error: {str(e)}"
 
+    async def stream_chat_with_stylist(
+        self,
+        analysis_context: Dict[str, Any],
+        chat_history: list,
+        user_message: str
+    ) -> AsyncIterator[str]:
+        """
+        Chat with AI stylist, yielding text chunks as the model produces them.
+        
+        The blocking stream is consumed on the Gemini pool, so it counts
+        against the same in-flight limit as other model calls. Closing the
+        generator early (e.g. the client disconnected) cancels the upstream
+        stream so the worker is freed right away.
+        """
+        prompt = self._build_chat_prompt(analysis_context, chat_history, user_message)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+        upstream = {}
+
+        def pump() -> None:
+            response = self.model.generate_content(prompt, stream=True)
+            upstream["response"] = response
+            try:
+                for chunk in response:
+                    if stopped.is_set():
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety metadata)
+                        continue
+                    loop.call_soon_threadsafe(chunks.put_nowait, text)
+            finally:
+                _cancel_stream(response)
+
+        def on_done(task: asyncio.Task) -> None:
+            if not task.cancelled():
+                task.exception()
+            chunks.put_nowait(_STREAM_END)
+
+        task = asyncio.ensure_future(gemini_executor.run(pump, timeout=settings.GEMINI_STREAM_TIMEOUT_SECONDS))
+        task.add_done_callback(on_done)
+        try:
+            while True:
+                text = await chunks.get()
+                if text is _STREAM_END:
+                    break
+                yield text
+            # Surface errors raised by the pump or the executor
+            await task
+        finally:
+            stopped.set()
+            if "response" in upstream:
+                _cancel_stream(upstream["response"])
+            if not task.done():
+                task.cancel()
+
 
 # Create singleton instance
 gemini_service = GeminiService()
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import socket
+from typing import Dict, List, Optional, Sequence, Set
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config.database import get_database
+from config.settings import settings
+from models.job import (
+    AnalysisJob, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+)
+from services.analysis_service import analysis_service
+from services.upload_service import upload_service
+
+
+class JobService:
+    """
+    Background analysis jobs backed by the `analysis_jobs` collection.
+
+    Workers claim queued jobs with a time-limited lease. A job whose worker
+    died keeps its `running` status until the lease expires, after which any
+    worker may claim it again. Failed attempts are retried with exponential
+    backoff until `max_attempts` is reached.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def enqueue(
+        self,
+        user_id: str,
+        filename: str,
+        image_digest: str,
+        occasion: Optional[str] = None,
+        weather: Optional[str] = None,
+        image_variants: Sequence[str] = ()
+    ) -> AnalysisJob:
+        """Queue an analysis of an already stored upload."""
+        db = await get_database()
+        now = datetime.utcnow()
+
+        job = {
+            "user_id": user_id,
+            "image_filename": filename,
+            "image_digest": image_digest,
+            "image_variants": list(image_variants),
+            "occasion": occasion,
+            "weather": weather,
+            "status": JOB_QUEUED,
+            "attempts": 0,
+            "max_attempts": settings.JOB_MAX_ATTEMPTS,
+            "available_at": now,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await db.analysis_jobs.insert_one(job)
+        job["_id"] = str(result.inserted_id)
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return AnalysisJob(**job)
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[AnalysisJob]:
+        """Get a job owned by the given user."""
+        db = await get_database()
+        try:
+            job = await db.analysis_jobs.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+        except Exception:
+            return None
+
+        if job:
+            job["_id"] = str(job["_id"])
+            return AnalysisJob(**job)
+        return None
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Receive status updates for a job processed by this process."""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        """Stop receiving status updates for a job."""
+        queues = self._subscribers.get(job_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[job_id]
+
+    def _publish(self, job: dict) -> None:
+        queues = self._subscribers.get(str(job["_id"]))
+        if not queues:
+            return
+        job = {**job, "_id": str(job["_id"])}
+        for queue in queues:
+            queue.put_nowait(AnalysisJob(**job))
+
+    async def _claim(self) -> Optional[dict]:
+        """Atomically lease the next runnable job, if any."""
+        db = await get_database()
+        now = datetime.utcnow()
+        return await db.analysis_jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": JOB_QUEUED, "available_at": {"$lte": now}},
+                    {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: dict, update: dict) -> None:
+        """Record the outcome of an attempt and notify subscribers."""
+        db = await get_database()
+        update["updated_at"] = datetime.utcnow()
+        job = await db.analysis_jobs.find_one_and_update(
+            {"_id": job["_id"], "worker_id": self.worker_id},
+            {"$set": update, "$unset": {"lease_expires_at": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            self._publish(job)
+
+    async def _process(self, job: dict) -> None:
+        self._publish(job)
+        retention = timedelta(seconds=settings.JOB_RETENTION_SECONDS)
+
+        if job["attempts"] > job["max_attempts"]:
+            # The lease of the final attempt expired, so its worker died mid-job
+            await upload_service.release(job["image_filename"])
+            await self._finish(job, {
+                "status": JOB_FAILED,
+                "error": "Analysis did not complete",
+                "expires_at": datetime.utcnow() + retention
+            })
+            return
+
+        try:
+            analysis = await analysis_service.analyze_and_store(
+                job["user_id"],
+                job["image_filename"],
+                job["image_digest"],
+                job.get("occasion"),
+                job.get("weather"),
+                job.get("image_variants", [])
+            )
+        except Exception as e:
+            print(f"Analysis job {job['_id']} attempt {job['attempts']} failed: {e}")
+            if job["attempts"] < job["max_attempts"]:
+                backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+                await self._finish(job, {
+                    "status": JOB_QUEUED,
+                    "error": str(e),
+                    "available_at": datetime.utcnow() + timedelta(seconds=backoff)
+                })
+            else:
+                await upload_service.release(job["image_filename"])
+                await self._finish(job, {
+                    "status": JOB_FAILED,
+                    "error": str(e),
+                    "expires_at": datetime.utcnow() + retention
+                })
+            return
+
+        await self._finish(job, {
+            "status": JOB_SUCCEEDED,
+            "analysis_id": analysis.id,
+            "error": None,
+            "expires_at": datetime.utcnow() + retention
+        })
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                print(f"Error claiming analysis job: {e}")
+                job = None
+
+            if job is None:
+                # Sleep until a local enqueue or the next poll, which also
+                # picks up jobs queued by other processes and expired leases
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._process(job)
+            except Exception as e:
+                print(f"Error processing analysis job {job['_id']}: {e}")
+
+    def start(self) -> None:
+        """Start the background workers."""
+        self._wakeup = asyncio.Event()
+        for _ in range(settings.JOB_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker_loop()))
+
+    async def stop(self) -> None:
+        """Stop the background workers; leased jobs are picked up again after their lease."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+job_service = JobService()
@@ -1,19 +1,38 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 from config.database import get_database
-from models.outfit import OutfitAnalysis, OutfitAnalysisCreate
+from models.outfit import FeedItem, OutfitAnalysis, OutfitAnalysisCreate, ReactionState
+from utils.pagination import KEYSET_SORT, keyset_filter, next_cursor
+
+
+def _without(values: dict, user_id: str) -> dict:
+    """Aggregation expression for an array with user_id removed."""
+    return {"$filter": {"input": values, "cond": {"$ne": ["$$this", user_id]}}}
 
 
 class OutfitService:
     @staticmethod
-    async def create_analysis(analysis_data: OutfitAnalysisCreate) -> OutfitAnalysis:
-        """Save outfit analysis to database."""
+    async def create_analysis(
+        analysis_data: OutfitAnalysisCreate,
+        features: Optional[Dict[str, Any]] = None
+    ) -> OutfitAnalysis:
+        """
+        Save outfit analysis to database.
+        
+        features are the image's similarity features (see
+        utils.image_features); they are stored on the document but never
+        returned by the API.
+        """
         db = await get_database()
         
         # Create analysis document
         analysis_dict = analysis_data.model_dump()
-        analysis_dict["created_at"] = datetime.utcnow()
+        analysis_dict["created_at"] = analysis_dict["updated_at"] = datetime.utcnow()
+        if features:
+            analysis_dict["features"] = features
         
         # Insert into database
         result = await db.outfit_analyses.insert_one(analysis_dict)
@@ -21,6 +40,50 @@ class OutfitService:
         
         return OutfitAnalysis(**analysis_dict)
     
+    @staticmethod
+    async def create_analyses(
+        analyses: List[OutfitAnalysisCreate],
+        features: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[Optional[OutfitAnalysis]]:
+        """
+        Save several outfit analyses in a single round trip.
+        
+        features, if given, holds the similarity features of each analysis, in order.
+        The insert is unordered, so one rejected document does not stop the
+        others; the result holds None for each analysis that was not saved.
+        Any other error is raised, and then each analysis may or may not
+        have been saved.
+        """
+        db = await get_database()
+        
+        now = datetime.utcnow()
+        docs = []
+        for analysis_data, analysis_features in zip(analyses, features or [None] * len(analyses)):
+            analysis_dict = analysis_data.model_dump()
+            analysis_dict["created_at"] = analysis_dict["updated_at"] = now
+            if analysis_features:
+                analysis_dict["features"] = analysis_features
+            docs.append(analysis_dict)
+        
+        failed = set()
+        try:
+            await db.outfit_analyses.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # A write concern error leaves it unknown which documents were kept
+            if e.details.get("writeConcernErrors"):
+                raise
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        
+        # insert_many sets the _id of each document in place
+        analyses_saved = []
+        for index, analysis_dict in enumerate(docs):
+            if index in failed:
+                analyses_saved.append(None)
+                continue
+            analysis_dict["_id"] = str(analysis_dict["_id"])
+            analyses_saved.append(OutfitAnalysis(**analysis_dict))
+        return analyses_saved
+    
     @staticmethod
     async def get_analysis_by_id(analysis_id: str) -> Optional[OutfitAnalysis]:
         """Get outfit analysis by ID."""
@@ -37,42 +100,169 @@ class OutfitService:
         
         return None
     
-    async def get_user_analyses(self, user_id: str, limit: int = 50, skip: int = 0) -> List[OutfitAnalysis]:
-        """Get all outfit analyses for a user."""
+    @staticmethod
+    async def _find_page(
+        query: dict,
+        limit: int,
+        skip: int,
+        projection: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        db = await get_database()
+        find = db.outfit_analyses.find(query, projection).sort(KEYSET_SORT).skip(skip)
+        docs = await find.limit(limit + 1).to_list(length=limit + 1)
+        return docs, next_cursor(docs, limit)
+
+    async def get_user_analyses(
+        self,
+        user_id: str,
+        limit: int = 50,
+        skip: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[OutfitAnalysis], Optional[str]]:
+        """
+        Get a page of outfit analyses for a user, newest first.
+        
+        When a cursor is given, the page starts right after it and skip is
+        ignored. Returns the analyses and the cursor of the next page.
+        Raises ValueError for a malformed cursor.
+        """
+        query = {"user_id": user_id, **keyset_filter(cursor)}
         try:
-            db = await get_database()
-            analyses = await db.outfit_analyses.find({"user_id": user_id})\
-                .sort("created_at", -1)\
-                .skip(skip)\
-                .limit(limit)\
-                .to_list(length=limit)
+            analyses, cursor_after = await self._find_page(query, limit, 0 if cursor else skip)
             
             # Convert ObjectId to string
             for doc in analyses:
                 doc["_id"] = str(doc["_id"])
                 
-            return [OutfitAnalysis(**analysis) for analysis in analyses]
+            return [OutfitAnalysis(**analysis) for analysis in analyses], cursor_after
         except Exception as e:
             print(f"Error fetching analyses: {e}")
-            return []
+            return [], None
+
+    async def get_user_analysis_versions(
+        self,
+        user_id: str,
+        limit: int = 50,
+        skip: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[Tuple[str, datetime]]:
+        """
+        Get (id, updated_at) for the page get_user_analyses would return.
+        
+        Only the version fields are loaded, so this is cheap enough to run
+        before deciding whether the client's cached page is still current.
+        """
+        query = {"user_id": user_id, **keyset_filter(cursor)}
+        docs, _ = await self._find_page(
+            query, limit, 0 if cursor else skip, {"created_at": 1, "updated_at": 1}
+        )
+        return [(str(doc["_id"]), doc.get("updated_at") or doc["created_at"]) for doc in docs]
 
-    async def get_community_feed(self, limit: int = 50, skip: int = 0) -> List[OutfitAnalysis]:
-        """Get all public outfit analyses."""
+    @staticmethod
+    async def get_analysis_version(analysis_id: str) -> Optional[dict]:
+        """
+        Get the owner, visibility and updated_at of an analysis, without the
+        analysis itself. Returns None if it does not exist.
+        """
+        db = await get_database()
         try:
-            db = await get_database()
-            analyses = await db.outfit_analyses.find({"is_public": True})\
-                .sort("created_at", -1)\
-                .skip(skip)\
-                .limit(limit)\
-                .to_list(length=limit)
+            doc = await db.outfit_analyses.find_one(
+                {"_id": ObjectId(analysis_id)},
+                {"user_id": 1, "is_public": 1, "created_at": 1, "updated_at": 1}
+            )
+        except Exception:
+            return None
+        if doc is None:
+            return None
+        return {
+            "user_id": doc["user_id"],
+            "is_public": doc.get("is_public", False),
+            "updated_at": doc.get("updated_at") or doc["created_at"]
+        }
+
+    @staticmethod
+    async def get_features(analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Get the similarity features stored on an analysis, if any."""
+        db = await get_database()
+        try:
+            doc = await db.outfit_analyses.find_one({"_id": ObjectId(analysis_id)}, {"features": 1})
+        except Exception:
+            return None
+        return doc.get("features") if doc else None
+
+    @staticmethod
+    def _feed_projection(viewer_id: Optional[str]) -> dict:
+        """
+        Project an analysis down to a FeedItem.
+        
+        Engagement counts are stored on the document and the viewer's own
+        reaction is computed server-side, so the member arrays never leave
+        the database.
+        """
+        likes = {"$ifNull": ["$likes", []]}
+        dislikes = {"$ifNull": ["$dislikes", []]}
+        return {
+            "user_id": 1,
+            "image_filename": 1,
+            "image_variants": 1,
+            "tags": 1,
+            "created_at": 1,
+            "score": "$analysis_result.outfit_rating.score",
+            "style_description": "$analysis_result.style_description",
+            "like_count": 1,
+            "dislike_count": 1,
+            "comment_count": 1,
+            "liked_by_me": {"$in": [viewer_id, likes]} if viewer_id else {"$literal": False},
+            "disliked_by_me": {"$in": [viewer_id, dislikes]} if viewer_id else {"$literal": False}
+        }
+
+    async def get_community_feed(
+        self,
+        limit: int = 50,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        viewer_id: Optional[str] = None
+    ) -> Tuple[List[FeedItem], Optional[str]]:
+        """
+        Get a page of public outfit summaries, newest first.
+        
+        Paginates like get_user_analyses. When viewer_id is given, each item
+        says whether that user liked or disliked it.
+        """
+        query = {"is_public": True, **keyset_filter(cursor)}
+        try:
+            analyses, cursor_after = await self._find_page(
+                query, limit, 0 if cursor else skip, self._feed_projection(viewer_id)
+            )
                 
             for doc in analyses:
                 doc["_id"] = str(doc["_id"])
                 
-            return [OutfitAnalysis(**analysis) for analysis in analyses]
+            return [FeedItem(**analysis) for analysis in analyses], cursor_after
         except Exception as e:
             print(f"Error fetching community feed: {e}")
-            return []
+            return [], None
+
+    async def get_feed_items(
+        self,
+        analysis_ids: List[str],
+        query: dict,
+        viewer_id: Optional[str] = None
+    ) -> Dict[str, FeedItem]:
+        """
+        Get the summaries of the given analyses that also match query, by id.
+        
+        Used to hydrate search results; ids that no longer match (deleted or
+        made private since) are simply missing from the result.
+        """
+        db = await get_database()
+        docs = await db.outfit_analyses.find(
+            {"_id": {"$in": [ObjectId(analysis_id) for analysis_id in analysis_ids]}, **query},
+            self._feed_projection(viewer_id)
+        ).to_list(length=len(analysis_ids))
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        return {doc["_id"]: FeedItem(**doc) for doc in docs}
 
     async def toggle_public(self, analysis_id: str, user_id: str, tags: List[str] = None) -> bool:
         """Toggle the public visibility of an analysis."""
@@ -85,7 +275,7 @@ class OutfitService:
             
             new_status = not analysis.get("is_public", False)
             
-            update_data = {"is_public": new_status}
+            update_data = {"is_public": new_status, "updated_at": datetime.utcnow()}
             if tags is not None and new_status: # Update tags only when making public
                  update_data["tags"] = tags
 
@@ -98,85 +288,62 @@ class OutfitService:
             print(f"Error toggling public status: {e}")
             raise e
 
-    async def toggle_like(self, analysis_id: str, user_id: str) -> bool:
-        """Toggle like on an analysis."""
+    @staticmethod
+    async def _toggle_reaction(analysis_id: str, user_id: str, field: str, opposite: str) -> Optional[ReactionState]:
+        """
+        Toggle user_id in one reaction array and remove it from the opposite one.
+        
+        Runs as a single update pipeline, so concurrent toggles cannot interleave,
+        and keeps like_count/dislike_count in step with the arrays. Only the
+        counts and the user's own flags are sent back.
+        """
+        current = {"$ifNull": [f"${field}", []]}
+        
+        db = await get_database()
+        state = await db.outfit_analyses.find_one_and_update(
+            {"_id": ObjectId(analysis_id)},
+            [
+                {"$set": {
+                    field: {"$cond": [
+                        {"$in": [user_id, current]},
+                        _without(current, user_id),
+                        {"$concatArrays": [current, [user_id]]}
+                    ]},
+                    opposite: _without({"$ifNull": [f"${opposite}", []]}, user_id)
+                }},
+                {"$set": {
+                    "like_count": {"$size": "$likes"},
+                    "dislike_count": {"$size": "$dislikes"},
+                    "updated_at": "$$NOW"
+                }}
+            ],
+            projection={
+                "_id": 0,
+                "liked": {"$in": [user_id, "$likes"]},
+                "disliked": {"$in": [user_id, "$dislikes"]},
+                "like_count": 1,
+                "dislike_count": 1
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        return ReactionState(**state) if state else None
+
+    async def toggle_like(self, analysis_id: str, user_id: str) -> Optional[ReactionState]:
+        """Toggle like on an analysis, clearing any dislike by the same user."""
         try:
-            db = await get_database()
-            analysis = await db.outfit_analyses.find_one({"_id": ObjectId(analysis_id)})
-            if not analysis:
-                return False
-            
-            likes = analysis.get("likes", [])
-            dislikes = analysis.get("dislikes", [])
-            
-            if user_id in likes:
-                # Unlike
-                await db.outfit_analyses.update_one(
-                    {"_id": ObjectId(analysis_id)},
-                    {"$pull": {"likes": user_id}}
-                )
-                return False
-            else:
-                # Like (and remove dislike if exists)
-                update_query = {"$addToSet": {"likes": user_id}}
-                if user_id in dislikes:
-                    update_query["$pull"] = {"dislikes": user_id}
-                
-                await db.outfit_analyses.update_one(
-                    {"_id": ObjectId(analysis_id)},
-                    update_query
-                )
-                return True
+            return await self._toggle_reaction(analysis_id, user_id, "likes", "dislikes")
         except Exception as e:
             print(f"Error toggling like: {e}")
             raise e
 
-    async def toggle_dislike(self, analysis_id: str, user_id: str) -> bool:
-        """Toggle dislike on an analysis."""
+    async def toggle_dislike(self, analysis_id: str, user_id: str) -> Optional[ReactionState]:
+        """Toggle dislike on an analysis, clearing any like by the same user."""
         try:
-            db = await get_database()
-            analysis = await db.outfit_analyses.find_one({"_id": ObjectId(analysis_id)})
-            if not analysis:
-                return False
-            
-            likes = analysis.get("likes", [])
-            dislikes = analysis.get("dislikes", [])
-            
-            if user_id in dislikes:
-                # Undislike
-                await db.outfit_analyses.update_one(
-                    {"_id": ObjectId(analysis_id)},
-                    {"$pull": {"dislikes": user_id}}
-                )
-                return False
-            else:
-                # Dislike (and remove like if exists)
-                update_query = {"$addToSet": {"dislikes": user_id}}
-                if user_id in likes:
-                    update_query["$pull"] = {"likes": user_id}
-                
-                await db.outfit_analyses.update_one(
-                    {"_id": ObjectId(analysis_id)},
-                    update_query
-                )
-                return True
+            return await self._toggle_reaction(analysis_id, user_id, "dislikes", "likes")
         except Exception as e:
             print(f"Error toggling dislike: {e}")
             raise e
             
-    async def add_comment(self, analysis_id: str, comment_data: dict) -> bool:
-        """Add a comment to an analysis."""
-        try:
-            db = await get_database()
-            await db.outfit_analyses.update_one(
-                {"_id": ObjectId(analysis_id)},
-                {"$push": {"comments": comment_data}}
-            )
-            return True
-        except Exception as e:
-            print(f"Error adding comment: {e}")
-            raise e
-    
     async def delete_analysis(self, analysis_id: str, user_id: str) -> bool:
         """Delete an outfit analysis."""
         try:
@@ -0,0 +1,203 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config.database import get_database
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.image_features import EMBEDDING_SIZE, FEATURE_VERSION, hamming_distances
+
+# Updates are re-read from slightly before the last sync, since updated_at
+# may come from the clock of another process or of the database
+SYNC_OVERLAP = timedelta(seconds=5)
+
+PUBLIC_SCOPE = "public"
+
+
+class _Corpus:
+    """Embeddings and perceptual hashes of a set of analyses, as NumPy arrays."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.embeddings = np.empty((0, EMBEDDING_SIZE), dtype=np.float32)
+        self.hashes = np.empty((0, 8), dtype=np.uint8)
+        self.synced_until: Optional[datetime] = None
+        # Monotonic clocks may start near zero, so never count as refreshed yet
+        self.refreshed_at = float("-inf")
+        self.rebuilt_at = float("-inf")
+        self.lock = asyncio.Lock()
+
+    def upsert(self, docs: Iterable[dict]) -> None:
+        """Add or replace the vectors of analyses; ones without current features are dropped."""
+        new_ids, new_embeddings, new_hashes, stale = [], [], [], []
+        for doc in docs:
+            analysis_id = str(doc["_id"])
+            features = doc.get("features")
+            if not features or features.get("version") != FEATURE_VERSION:
+                stale.append(analysis_id)
+                continue
+            embedding = np.frombuffer(features["embedding"], dtype=np.float16).astype(np.float32)
+            dhash = np.frombuffer(features["dhash"], dtype=np.uint8)
+            position = self.positions.get(analysis_id)
+            if position is None:
+                new_ids.append(analysis_id)
+                new_embeddings.append(embedding)
+                new_hashes.append(dhash)
+            else:
+                self.embeddings[position] = embedding
+                self.hashes[position] = dhash
+
+        if new_ids:
+            self.positions.update((analysis_id, len(self.ids) + i) for i, analysis_id in enumerate(new_ids))
+            self.ids.extend(new_ids)
+            self.embeddings = np.vstack([self.embeddings, np.stack(new_embeddings)])
+            self.hashes = np.vstack([self.hashes, np.stack(new_hashes)])
+        self.remove(stale)
+
+    def remove(self, analysis_ids: Iterable[str]) -> None:
+        """Drop analyses from the corpus."""
+        positions = [self.positions[analysis_id] for analysis_id in analysis_ids if analysis_id in self.positions]
+        if not positions:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[positions] = False
+        self.embeddings = self.embeddings[keep]
+        self.hashes = self.hashes[keep]
+        self.ids = [analysis_id for analysis_id, kept in zip(self.ids, keep) if kept]
+        self.positions = {analysis_id: i for i, analysis_id in enumerate(self.ids)}
+
+    def clear(self) -> None:
+        self.ids = []
+        self.positions = {}
+        self.embeddings = self.embeddings[:0]
+        self.hashes = self.hashes[:0]
+
+
+class SimilarityService:
+    """
+    Similar-outfit search over the features stored on analyses.
+
+    The vectors of a user's analyses, or of all public ones, are loaded into
+    an in-memory corpus on first use. Afterwards only analyses updated since
+    the last sync are re-read, at most every SIMILARITY_REFRESH_SECONDS,
+    with a full reload every SIMILARITY_FULL_REFRESH_SECONDS to drop
+    analyses deleted by other processes. Queries are a single matrix-vector
+    product over the corpus.
+    """
+
+    def __init__(self):
+        self._public = _Corpus()
+        self._users = TTLCache(settings.SIMILARITY_MAX_CORPORA, settings.SIMILARITY_FULL_REFRESH_SECONDS)
+
+    def _corpus(self, scope: str) -> _Corpus:
+        if scope == PUBLIC_SCOPE:
+            return self._public
+        corpus = self._users.get(scope)
+        if corpus is None:
+            corpus = _Corpus()
+        # Re-setting keeps corpora in use from expiring
+        self._users.set(scope, corpus)
+        return corpus
+
+    async def _refresh(self, scope: str, corpus: _Corpus) -> None:
+        if time.monotonic() - corpus.refreshed_at < settings.SIMILARITY_REFRESH_SECONDS:
+            return
+        async with corpus.lock:
+            now = time.monotonic()
+            if now - corpus.refreshed_at < settings.SIMILARITY_REFRESH_SECONDS:
+                return
+
+            db = await get_database()
+            started = datetime.utcnow()
+            # A corpus never loaded has nothing to update incrementally
+            full = (
+                corpus.synced_until is None
+                or now - corpus.rebuilt_at >= settings.SIMILARITY_FULL_REFRESH_SECONDS
+            )
+            query = {} if scope == PUBLIC_SCOPE else {"user_id": scope}
+            if full:
+                query["features.version"] = FEATURE_VERSION
+                if scope == PUBLIC_SCOPE:
+                    query["is_public"] = True
+            else:
+                # Analyses that stopped being public are read too, so they can be dropped
+                query["updated_at"] = {"$gt": corpus.synced_until - SYNC_OVERLAP}
+
+            docs = await db.outfit_analyses.find(query, {"features": 1, "is_public": 1}).to_list(length=None)
+            if full:
+                corpus.clear()
+                corpus.rebuilt_at = now
+            if scope == PUBLIC_SCOPE:
+                corpus.remove(str(doc["_id"]) for doc in docs if not doc.get("is_public"))
+                docs = [doc for doc in docs if doc.get("is_public")]
+            corpus.upsert(docs)
+            corpus.synced_until = started
+            corpus.refreshed_at = now
+
+    async def find_similar(
+        self,
+        scope: str,
+        features: dict,
+        limit: int = 10,
+        exclude_id: Optional[str] = None
+    ) -> List[Tuple[str, float, int]]:
+        """
+        Find the analyses most similar to the given features.
+
+        scope is a user id, for that user's analyses, or PUBLIC_SCOPE.
+        Returns (analysis_id, cosine similarity, dhash Hamming distance),
+        most similar first.
+        """
+        corpus = self._corpus(scope)
+        await self._refresh(scope, corpus)
+
+        scores = corpus.embeddings @ np.frombuffer(features["embedding"], dtype=np.float16).astype(np.float32)
+        candidates = len(scores)
+        if exclude_id in corpus.positions:
+            scores[corpus.positions[exclude_id]] = -np.inf
+            candidates -= 1
+        k = min(limit, candidates)
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        distances = hamming_distances(corpus.hashes[top], features["dhash"])
+        return [
+            (corpus.ids[position], float(scores[position]), int(distance))
+            for position, distance in zip(top, distances)
+        ]
+
+    async def find_near_duplicate(self, user_id: str, features: dict) -> Optional[str]:
+        """
+        Return the id of the user's closest analysis whose perceptual hash is
+        within SIMILARITY_DUPLICATE_MAX_DISTANCE bits, if any.
+        """
+        corpus = self._corpus(user_id)
+        await self._refresh(user_id, corpus)
+        if not corpus.ids:
+            return None
+        distances = hamming_distances(corpus.hashes, features["dhash"])
+        closest = int(np.argmin(distances))
+        if distances[closest] > settings.SIMILARITY_DUPLICATE_MAX_DISTANCE:
+            return None
+        return corpus.ids[closest]
+
+    def forget(self, analysis_id: str, user_id: str) -> None:
+        """Drop a deleted analysis from the corpora of this process."""
+        self._public.remove([analysis_id])
+        corpus = self._users.get(user_id)
+        if corpus is not None:
+            corpus.remove([analysis_id])
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of loaded corpora and the size of the public one."""
+        return {
+            "user_corpora": self._users.stats()["size"],
+            "public_size": len(self._public.ids),
+        }
+
+
+similarity_service = SimilarityService()
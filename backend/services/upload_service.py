@@ -0,0 +1,181 @@
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncContextManager, Dict, Optional, Tuple
+import aiofiles.os
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from config.database import get_database
+from config.settings import settings
+from services.cleanup_service import cleanup_service
+from storage.factory import storage, upload_temp_dir
+from utils.file_utils import IMAGE_VARIANTS, StoredUpload, spool_upload, variant_filename
+from utils.image_features import FEATURE_VERSION, extract_features
+from utils.image_utils import image_executor, make_variants, variant_edges
+
+
+class UploadService:
+    """
+    Content-addressed image uploads on the configured storage backend.
+    
+    An upload is stored under the SHA-256 of its bytes, so identical images
+    share one object and one set of derivatives. The `stored_objects`
+    collection counts the analyses and pending jobs that reference each
+    object; its files are queued for deletion when the last reference is
+    released.
+    """
+
+    async def store(self, file: UploadFile) -> StoredUpload:
+        """
+        Validate and store an upload, taking one reference to it.
+        
+        Raises UploadValidationError if the file is rejected.
+        """
+        spooled = await spool_upload(file, upload_temp_dir())
+        key = f"{spooled.digest}.{spooled.file_type}"
+        
+        db = await get_database()
+        now = datetime.utcnow()
+        try:
+            # updated_at keeps the reconciler off objects whose analysis is still being saved
+            stored = await db.stored_objects.find_one_and_update(
+                {"_id": key},
+                {
+                    "$inc": {"refs": 1},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"size": spooled.size, "created_at": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except BaseException:
+            await aiofiles.os.remove(spooled.path)
+            raise
+        
+        try:
+            if stored.get("variants") is not None and await storage.exists(key):
+                # Same image as an earlier upload: reuse its object and derivatives
+                variants = tuple(stored["variants"])
+                features = stored.get("features")
+                if not features or features.get("version") != FEATURE_VERSION:
+                    # Stored before the current features existed
+                    features = await self._extract_features(spooled.path, key)
+                    await db.stored_objects.update_one({"_id": key}, {"$set": {"features": features}})
+                await aiofiles.os.remove(spooled.path)
+            else:
+                # A deletion queued by an earlier release must not remove the files written below
+                await cleanup_service.cancel(key)
+                # Derivatives go in first, so an existing original implies they exist
+                variants = await self._store_variants(spooled.path, key)
+                features = await self._extract_features(spooled.path, key)
+                await storage.put_file(spooled.path, key)
+                await db.stored_objects.update_one(
+                    {"_id": key},
+                    {"$set": {"variants": list(variants), "features": features}}
+                )
+        except BaseException:
+            if await aiofiles.os.path.exists(spooled.path):
+                await aiofiles.os.remove(spooled.path)
+            await self.release(key)
+            raise
+        
+        return StoredUpload(
+            filename=key, size=spooled.size, digest=spooled.digest, variants=variants, features=features
+        )
+
+    async def _store_variants(self, source_path: str, key: str) -> Tuple[str, ...]:
+        """
+        Generate and store the IMAGE_VARIANTS of an image.
+        
+        Returns the names of the variants that were stored. Failures are
+        logged rather than raised: clients fall back to the original image.
+        """
+        edges = variant_edges()
+        temp_paths = {
+            variant: os.path.join(upload_temp_dir(), f"{uuid.uuid4()}.{variant}.webp")
+            for variant in IMAGE_VARIANTS
+        }
+        try:
+            await image_executor.run(
+                make_variants,
+                source_path,
+                [(temp_paths[variant], edges[variant]) for variant in reversed(IMAGE_VARIANTS)],
+                settings.IMAGE_VARIANT_QUALITY
+            )
+            for variant, temp_path in temp_paths.items():
+                await storage.put_file(temp_path, variant_filename(key, variant))
+        except Exception as e:
+            print(f"Could not create image variants for {key}: {e}")
+            return ()
+        finally:
+            for temp_path in temp_paths.values():
+                if await aiofiles.os.path.exists(temp_path):
+                    await aiofiles.os.remove(temp_path)
+        return IMAGE_VARIANTS
+
+    @staticmethod
+    async def _extract_features(source_path: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Compute the similarity features of an image (see utils.image_features).
+        
+        Returns None if they cannot be computed; the image is then simply
+        left out of similarity search.
+        """
+        try:
+            return await image_executor.run(extract_features, source_path)
+        except Exception as e:
+            print(f"Could not extract image features for {key}: {e}")
+            return None
+
+    async def extract_features(self, key: str) -> Optional[Dict[str, Any]]:
+        """(Re)compute the similarity features of an already stored upload."""
+        async with storage.local_copy(key) as path:
+            features = await self._extract_features(path, key)
+        if features is not None:
+            db = await get_database()
+            await db.stored_objects.update_one({"_id": key}, {"$set": {"features": features}})
+        return features
+
+    async def get_features(self, key: str) -> Optional[Dict[str, Any]]:
+        """Similarity features recorded for an upload, if any."""
+        db = await get_database()
+        stored = await db.stored_objects.find_one({"_id": key}, {"features": 1})
+        return stored.get("features") if stored else None
+
+    async def generate_variants(self, key: str) -> Tuple[str, ...]:
+        """(Re)generate the derivatives of an already stored upload."""
+        async with storage.local_copy(key) as path:
+            variants = await self._store_variants(path, key)
+        db = await get_database()
+        await db.stored_objects.update_one({"_id": key}, {"$set": {"variants": list(variants)}})
+        return variants
+
+    async def release(self, key: str) -> bool:
+        """
+        Drop one reference to an upload, queueing its deletion with the last one.
+        
+        Returns True if the files were queued for deletion.
+        """
+        db = await get_database()
+        stored = await db.stored_objects.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"refs": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if stored is not None:
+            if stored["refs"] > 0:
+                return False
+            # Only the release that removes the record queues the deletion
+            result = await db.stored_objects.delete_one({"_id": key, "refs": {"$lte": 0}})
+            if result.deleted_count == 0:
+                return False
+        # Uploads that predate reference counting have no record and a single owner
+        await cleanup_service.enqueue(key)
+        return True
+
+    def local_copy(self, key: str) -> AsyncContextManager[str]:
+        """Local path of a stored upload, for decoding it; see StorageBackend.local_copy."""
+        return storage.local_copy(key)
+
+
+upload_service = UploadService()
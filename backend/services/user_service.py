@@ -2,8 +2,18 @@ from typing import Optional
 from datetime import datetime
 from bson import ObjectId
 from config.database import get_database
+from config.settings import settings
 from models.user import UserCreate, UserInDB
 from auth.jwt_handler import get_password_hash
+from utils.cache import TTLCache
+
+# Short-lived cache of user lookups, keyed by ("id", user_id) and ("email", email)
+user_cache = TTLCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
+
+
+def _cache_user(user: UserInDB) -> None:
+    user_cache.set(("id", user.id), user)
+    user_cache.set(("email", user.email), user)
 
 
 class UserService:
@@ -26,7 +36,7 @@ class UserService:
         user_dict = {
             "email": user_data.email,
             "username": user_data.username,
-            "hashed_password": get_password_hash(user_data.password),
+            "hashed_password": await get_password_hash(user_data.password),
             "created_at": datetime.utcnow()
         }
         
@@ -39,28 +49,56 @@ class UserService:
     @staticmethod
     async def get_user_by_email(email: str) -> Optional[UserInDB]:
         """Get user by email."""
+        cached = user_cache.get(("email", email))
+        if cached is not None:
+            return cached
+        
         db = await get_database()
         user = await db.users.find_one({"email": email})
         
         if user:
             user["_id"] = str(user["_id"])
-            return UserInDB(**user)
+            user = UserInDB(**user)
+            _cache_user(user)
+            return user
         return None
     
     @staticmethod
     async def get_user_by_id(user_id: str) -> Optional[UserInDB]:
         """Get user by ID."""
+        cached = user_cache.get(("id", user_id))
+        if cached is not None:
+            return cached
+        
         db = await get_database()
         
         try:
             user = await db.users.find_one({"_id": ObjectId(user_id)})
             if user:
                 user["_id"] = str(user["_id"])
-                return UserInDB(**user)
+                user = UserInDB(**user)
+                _cache_user(user)
+                return user
         except Exception:
             pass
         
         return None
+    
+    @staticmethod
+    async def update_password_hash(user: UserInDB, hashed_password: str) -> None:
+        """Replace a user's stored password hash."""
+        db = await get_database()
+        await db.users.update_one(
+            {"_id": ObjectId(user.id)},
+            {"$set": {"hashed_password": hashed_password}}
+        )
+        UserService.invalidate_user(user)
+    
+    @staticmethod
+    def invalidate_user(user: UserInDB) -> None:
+        """Drop a user from the lookup cache after it changes."""
+        user_cache.pop(("id", user.id))
+        user_cache.pop(("email", user.email))
 
 
 user_service = UserService()
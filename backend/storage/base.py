@@ -0,0 +1,92 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, List, NamedTuple, Optional
+
+# Uploads are public, and a key is never rewritten with different content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified_at: datetime
+
+
+def shard_path(key: str) -> str:
+    """
+    Relative location of a key, spread over two levels of subdirectories.
+    
+    `9b456ec3….jpg` is stored as `9b/45/9b456ec3….jpg`, which keeps every
+    directory small enough for fast lookups and incremental backups.
+    """
+    return f"{key[:2]}/{key[2:4]}/{key}"
+
+
+def is_upload_path(path: str) -> bool:
+    """
+    Whether a path relative to the storage root is an upload, i.e. the
+    shard_path of an image key. Anything else found in storage (backups,
+    other applications' files) must never be touched.
+    """
+    key = path.rsplit("/", 1)[-1]
+    return shard_path(key) == path and os.path.splitext(key)[1].lower() in CONTENT_TYPES
+
+
+def content_type(key: str) -> str:
+    """MIME type of a stored image, from its extension."""
+    return CONTENT_TYPES.get(os.path.splitext(key)[1].lower(), "application/octet-stream")
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded images and their derivatives live.
+    
+    Keys are flat file names; each backend decides how to lay them out.
+    Every operation is async, so no file or network I/O happens on the
+    event loop.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def put_file(self, local_path: str, key: str) -> None:
+        """Move a local file into storage under key, replacing any existing object."""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Whether an object is stored under key."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Delete an object; returns False if it did not exist."""
+
+    @abstractmethod
+    def list_objects(self) -> AsyncIterator[List[StoredObject]]:
+        """Yield every stored object, in batches."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """URL clients use to fetch an object."""
+
+    @abstractmethod
+    def local_copy(self, key: str) -> AsyncContextManager[str]:
+        """
+        Path of a local file holding the object, for code that needs one
+        (e.g. image decoding). Remote backends download it to a temporary
+        file that is removed on exit. Raises FileNotFoundError if missing.
+        """
+
+    async def size(self, key: str) -> Optional[int]:
+        """Size of an object in bytes, or None if it does not exist."""
+        return None
+
+    async def close(self) -> None:
+        """Release resources held by the backend."""
@@ -0,0 +1,42 @@
+import os
+from config.settings import settings
+from storage.base import StorageBackend
+from utils.concurrency import BoundedExecutor
+
+
+def upload_temp_dir() -> str:
+    """Local scratch directory where uploads are spooled before being stored."""
+    return os.path.join(settings.UPLOAD_DIR, ".tmp")
+
+
+def create_storage() -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND."""
+    if settings.STORAGE_BACKEND == "local":
+        from storage.local import LocalStorage
+        return LocalStorage(settings.UPLOAD_DIR)
+
+    if settings.STORAGE_BACKEND == "s3":
+        from storage.s3 import S3Storage
+        executor = BoundedExecutor(
+            "storage",
+            max_in_flight=settings.STORAGE_MAX_IN_FLIGHT,
+            max_queue=settings.STORAGE_MAX_QUEUE,
+            timeout=settings.STORAGE_TIMEOUT_SECONDS,
+        )
+        return S3Storage(
+            settings.S3_BUCKET,
+            executor,
+            # Blank values in .env mean "not set"
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region=settings.S3_REGION or None,
+            access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            public_url=settings.S3_PUBLIC_URL or None,
+            temp_dir=upload_temp_dir(),
+            prefix=settings.S3_KEY_PREFIX,
+        )
+
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+storage = create_storage()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+import aiofiles.os
+from storage.base import StorageBackend, StoredObject, is_upload_path, shard_path
+
+
+def _scan(root: str, directory: str) -> List[StoredObject]:
+    """List the uploads in one shard directory (runs in a worker thread)."""
+    objects = []
+    shard = os.path.relpath(directory, root).replace(os.sep, "/")
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and is_upload_path(f"{shard}/{entry.name}"):
+                stat = entry.stat()
+                objects.append(StoredObject(entry.name, stat.st_size, datetime.utcfromtimestamp(stat.st_mtime)))
+    return objects
+
+
+def _shard_dirs(root: str) -> List[str]:
+    """List the second-level shard directories under root."""
+    directories = []
+    for first in sorted(os.listdir(root)):
+        first_path = os.path.join(root, first)
+        if len(first) != 2 or not os.path.isdir(first_path):
+            continue
+        for second in sorted(os.listdir(first_path)):
+            second_path = os.path.join(first_path, second)
+            if len(second) == 2 and os.path.isdir(second_path):
+                directories.append(second_path)
+    return directories
+
+
+class LocalStorage(StorageBackend):
+    """
+    Uploads on the local filesystem under root, in hash-sharded subdirectories.
+    
+    Objects are served by the /uploads static mount, so url() is the path
+    under it. Files are moved in with an atomic rename, so readers never
+    see a partial object.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: str = "/uploads"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, shard_path(key))
+
+    async def put_file(self, local_path: str, key: str) -> None:
+        path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        await aiofiles.os.replace(local_path, path)
+
+    async def exists(self, key: str) -> bool:
+        return await aiofiles.os.path.exists(self.path(key))
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await aiofiles.os.stat(self.path(key))).st_size
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str) -> bool:
+        try:
+            await aiofiles.os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def list_objects(self) -> AsyncIterator[List[StoredObject]]:
+        if not await aiofiles.os.path.isdir(self.root):
+            return
+        # One batch per shard directory keeps memory flat however many files there are
+        for directory in await asyncio.to_thread(_shard_dirs, self.root):
+            objects = await asyncio.to_thread(_scan, self.root, directory)
+            if objects:
+                yield objects
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{shard_path(key)}"
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        path = self.path(key)
+        if not await aiofiles.os.path.exists(path):
+            raise FileNotFoundError(key)
+        yield path
@@ -0,0 +1,144 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import timezone
+from typing import AsyncIterator, List, Optional
+import aiofiles.os
+from storage.base import (
+    IMMUTABLE_CACHE_CONTROL, StorageBackend, StoredObject, content_type, is_upload_path, shard_path
+)
+from utils.concurrency import BoundedExecutor
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+
+class S3Storage(StorageBackend):
+    """
+    Uploads in an S3-compatible bucket (AWS S3, MinIO, ...).
+    
+    boto3 is blocking, so every call runs on a bounded thread pool. Set
+    endpoint_url to use a MinIO or other S3-compatible server; path-style
+    addressing is used then, as those servers usually expect.
+    Objects are written with an immutable Cache-Control and served straight
+    from the bucket or public_url (e.g. a CDN in front of it). With a
+    prefix, every object lives under it, so the bucket can be shared.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        executor: BoundedExecutor,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        public_url: Optional[str] = None,
+        temp_dir: Optional[str] = None,
+        prefix: str = ""
+    ):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+
+        self.bucket = bucket
+        self.executor = executor
+        self.temp_dir = temp_dir
+        self.prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=BotoConfig(s3={"addressing_style": "path"} if endpoint_url else {}),
+        )
+
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+
+    def object_key(self, key: str) -> str:
+        """Key of the S3 object holding an upload."""
+        return f"{self.prefix}{shard_path(key)}"
+
+    async def put_file(self, local_path: str, key: str) -> None:
+        await self.executor.run(
+            self.client.upload_file,
+            local_path,
+            self.bucket,
+            self.object_key(key),
+            ExtraArgs={"ContentType": content_type(key), "CacheControl": IMMUTABLE_CACHE_CONTROL},
+        )
+        await aiofiles.os.remove(local_path)
+
+    async def _head(self, key: str) -> Optional[dict]:
+        try:
+            return await self.executor.run(self.client.head_object, Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await self._head(key) is not None
+
+    async def size(self, key: str) -> Optional[int]:
+        head = await self._head(key)
+        return head["ContentLength"] if head else None
+
+    async def delete(self, key: str) -> bool:
+        if not await self.exists(key):
+            return False
+        await self.executor.run(self.client.delete_object, Bucket=self.bucket, Key=self.object_key(key))
+        return True
+
+    async def list_objects(self) -> AsyncIterator[List[StoredObject]]:
+        # One batch per ListObjectsV2 page (up to 1000 keys)
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix}
+        while True:
+            page = await self.executor.run(self.client.list_objects_v2, **kwargs)
+            # Objects outside the upload layout are not ours to report
+            objects = [
+                StoredObject(
+                    item["Key"].rsplit("/", 1)[-1],
+                    item["Size"],
+                    item["LastModified"].astimezone(timezone.utc).replace(tzinfo=None)
+                )
+                for item in page.get("Contents", [])
+                if is_upload_path(item["Key"][len(self.prefix):])
+            ]
+            if objects:
+                yield objects
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{self.object_key(key)}"
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1], dir=self.temp_dir)
+        os.close(fd)
+        try:
+            try:
+                await self.executor.run(self.client.download_file, self.bucket, self.object_key(key), path)
+            except ClientError as e:
+                raise FileNotFoundError(key) from e
+            yield path
+        finally:
+            await aiofiles.os.remove(path)
+
+    async def close(self) -> None:
+        self.executor.shutdown()
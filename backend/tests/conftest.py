@@ -0,0 +1,5 @@
+import os
+
+# Required settings, so modules can be imported without a .env
+os.environ.setdefault("SECRET_KEY", "test-secret-key-of-at-least-32-characters")
+os.environ.setdefault("GEMINI_API_KEY", "test")
@@ -0,0 +1,16 @@
+from services.closet_service import _csv_in_quotes, _csv_row
+
+
+def test_quote_inside_unquoted_field_does_not_open_it():
+    assert not _csv_in_quotes('Jeans,bottom,blue,32" inseam', False)
+
+
+def test_quoted_field_spans_lines():
+    record = ['Tee,top,white,"Soft cotton', 'with a ""vintage"" wash",casual']
+    assert _csv_in_quotes(record[0], False)
+    assert not _csv_in_quotes(record[1], True)
+    assert _csv_row(record)[3] == 'Soft cotton\nwith a "vintage" wash'
+
+
+def test_doubled_quote_keeps_field_open():
+    assert _csv_in_quotes('Cap,accessory,red,"say ""hi', False)
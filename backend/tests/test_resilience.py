@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from utils.resilience import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CircuitBreaker, CircuitOpenError, ResilientCaller, UpstreamUnavailableError
+)
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class FakeModel:
+    """Stands in for the Gemini model: fails, hangs or answers as told."""
+
+    def __init__(self):
+        self.mode = "ok"
+        self.calls = 0
+
+    async def generate_content(self):
+        self.calls += 1
+        if self.mode == "fail":
+            raise Unavailable("service unavailable")
+        if self.mode == "hang":
+            await asyncio.Event().wait()
+        return "response"
+
+
+async def _no_sleep(seconds):
+    pass
+
+
+def _caller(reset_seconds: float = 0.0) -> ResilientCaller:
+    return ResilientCaller(
+        "fake",
+        max_attempts=1,
+        base_delay=0.0,
+        max_delay=0.0,
+        breaker=CircuitBreaker("fake", failure_threshold=1, reset_seconds=reset_seconds),
+        sleep=_no_sleep
+    )
+
+
+def test_cancelled_probe_releases_half_open_circuit():
+    async def scenario():
+        model = FakeModel()
+        caller = _caller()
+
+        model.mode = "fail"
+        with pytest.raises(UpstreamUnavailableError):
+            await caller.call(model.generate_content)
+
+        model.mode = "hang"
+        probe = asyncio.ensure_future(caller.call(model.generate_content))
+        await asyncio.sleep(0)
+        assert caller.breaker.state == CIRCUIT_HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        model.mode = "ok"
+        assert await caller.call(model.generate_content) == "response"
+        assert caller.breaker.state == CIRCUIT_CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_rejects_without_calling_upstream():
+    async def scenario():
+        model = FakeModel()
+        caller = _caller(reset_seconds=60.0)
+
+        model.mode = "fail"
+        with pytest.raises(UpstreamUnavailableError):
+            await caller.call(model.generate_content)
+        with pytest.raises(CircuitOpenError):
+            await caller.call(model.generate_content)
+        assert model.calls == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+from PIL import Image
+import services.similarity_service as similarity
+from utils.image_features import extract_features
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if doc.get("user_id") == query.get("user_id", doc.get("user_id"))])
+
+
+def _embedding(features: dict) -> np.ndarray:
+    return np.frombuffer(features["embedding"], dtype=np.float16).astype(np.float32)
+
+
+def test_flat_image_embedding_has_unit_length(tmp_path):
+    path = tmp_path / "flat.png"
+    Image.new("RGB", (64, 64), (120, 40, 200)).save(path)
+    assert abs(np.linalg.norm(_embedding(extract_features(str(path)))) - 1) < 1e-2
+
+
+def test_first_refresh_loads_corpus_right_after_boot(tmp_path, monkeypatch):
+    paths = []
+    for name, color in (("red", (200, 30, 30)), ("blue", (30, 30, 200))):
+        path = tmp_path / f"{name}.png"
+        Image.new("RGB", (64, 64), color).save(path)
+        paths.append(str(path))
+    red, blue = (extract_features(path) for path in paths)
+    collection = FakeCollection([
+        {"_id": "red", "user_id": "u1", "features": red, "is_public": False},
+        {"_id": "blue", "user_id": "u1", "features": blue, "is_public": False},
+    ])
+
+    async def get_database():
+        return SimpleNamespace(outfit_analyses=collection)
+
+    monkeypatch.setattr(similarity, "get_database", get_database)
+    # monotonic() is small on a freshly booted host
+    monkeypatch.setattr(similarity, "time", SimpleNamespace(monotonic=lambda: 1.0))
+
+    service = similarity.SimilarityService()
+    results = asyncio.run(service.find_similar("u1", red))
+    assert [analysis_id for analysis_id, _, _ in results] == ["red", "blue"]
+    assert abs(results[0][1] - 1) < 1e-2
+    assert "updated_at" not in collection.queries[0]
@@ -0,0 +1,124 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorBusyError(Exception):
+    """Raised when a bounded executor's wait queue is already full."""
+
+
+class ExecutorTimeoutError(Exception):
+    """Raised when a call does not finish within its timeout."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking callables off the event loop with a fixed number of calls
+    in flight and a bounded number of callers waiting for a slot.
+
+    Callers beyond the wait queue are rejected immediately with
+    ExecutorBusyError so the API can shed load instead of piling up requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        timeout: Optional[float] = None,
+        use_processes: bool = False,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self._pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_in_flight)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight,
+                    thread_name_prefix=self.name,
+                )
+        return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._slots
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) in the pool and return its result.
+
+        The timeout covers both waiting for a slot and the call itself. A call
+        that times out keeps its slot until the worker actually finishes, so
+        the pool is never oversubscribed by abandoned calls.
+        """
+        free_slots = self.max_in_flight - self._in_flight
+        if self._waiting >= free_slots + self.max_queue:
+            self._rejected += 1
+            raise ExecutorBusyError(f"{self.name} is at capacity, please retry shortly")
+
+        timeout = self.timeout if timeout is None else timeout
+        slots = self._get_slots()
+        # Count the caller as waiting right away so concurrent callers see it
+        self._waiting += 1
+        waiting = True
+
+        async def submit() -> Any:
+            nonlocal waiting
+            await slots.acquire()
+            waiting = False
+            self._waiting -= 1
+            self._in_flight += 1
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._get_pool(), partial(func, *args, **kwargs))
+            future.add_done_callback(self._release)
+            # Shield so a timeout or cancelled request does not free the slot
+            # while the worker is still busy with the call
+            return await asyncio.shield(future)
+
+        try:
+            return await asyncio.wait_for(submit(), timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise ExecutorTimeoutError(f"{self.name} call timed out after {timeout}s")
+        finally:
+            if waiting:
+                self._waiting -= 1
+
+    def _release(self, future: asyncio.Future) -> None:
+        # Mark the exception as retrieved for calls nobody is awaiting anymore
+        if not future.cancelled():
+            future.exception()
+        self._in_flight -= 1
+        self._completed += 1
+        self._get_slots().release()
+
+    def stats(self) -> Dict[str, int]:
+        """Return current load and lifetime counters."""
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool without waiting for abandoned calls."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
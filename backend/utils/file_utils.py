@@ -1,68 +1,155 @@
 import os
+import hashlib
 import aiofiles
-from typing import Tuple
+import aiofiles.os
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
 from fastapi import UploadFile, HTTPException
 from config.settings import settings
+from storage.factory import storage
 import uuid
 
 
-async def validate_file(file: UploadFile) -> Tuple[bool, str]:
-    """
-    Validate uploaded file for size and extension.
-    Returns (is_valid, error_message)
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Allowance for multipart boundaries and form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Resized WebP derivatives generated for each upload, smallest first
+IMAGE_VARIANTS = ("thumb", "medium")
+
+# Leading bytes of each accepted image format
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "jpg",
+    b"\x89PNG\r\n\x1a\n": "png",
+}
+
+
+class UploadValidationError(ValueError):
+    """Raised when an upload is rejected, carrying the HTTP status to return."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    digest: str
+    file_type: str
+
+
+class StoredUpload(NamedTuple):
+    # Storage key of the upload, which is also the analysis' image_filename
+    filename: str
+    size: int
+    digest: str
+    # Names of the IMAGE_VARIANTS that were generated for the upload
+    variants: Tuple[str, ...] = ()
+    # Similarity features (see utils.image_features), None if they could not be computed
+    features: Optional[Dict[str, Any]] = None
+
+
+def upload_too_large_message() -> str:
+    max_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
+    return f"File too large. Maximum size: {max_mb}MB"
+
+
+def exceeds_upload_limit(content_length: Optional[str], max_files: int = 1) -> bool:
     """
-    # Check file extension
-    file_ext = file.filename.split(".")[-1].lower()
-    if file_ext not in settings.extensions_list:
-        return False, f"File type not allowed. Allowed types: {', '.join(settings.extensions_list)}"
+    Check a request's Content-Length against the upload limit.
     
-    # Read file to check size
-    content = await file.read()
-    file_size = len(content)
-    
-    # Reset file pointer
-    await file.seek(0)
-    
-    if file_size > settings.MAX_UPLOAD_SIZE:
-        max_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
-        return False, f"File too large. Maximum size: {max_mb}MB"
-    
-    return True, ""
+    Lets oversized requests be rejected before the body is read at all.
+    A missing or malformed header is left to the streaming check.
+    """
+    try:
+        length = int(content_length)
+    except (TypeError, ValueError):
+        return False
+    return length > max_files * settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
 
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image type from its magic bytes, ignoring the filename."""
+    for signature, file_type in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return file_type
+    return None
 
-async def save_upload_file(file: UploadFile) -> str:
+
+async def spool_upload(file: UploadFile, directory: str) -> SpooledUpload:
     """
-    Save uploaded file to the upload directory.
-    Returns the saved filename.
+    Stream an uploaded image to a temporary file in directory in a single pass.
+    
+    The type is taken from the file's magic bytes, the size limit is enforced
+    chunk by chunk and the SHA-256 digest is computed along the way, so the
+    upload is never held in memory as a whole. The caller owns the returned
+    file. Raises UploadValidationError if the file is rejected.
     """
-    # Create upload directory if it doesn't exist
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    await aiofiles.os.makedirs(directory, exist_ok=True)
     
-    # Generate unique filename
-    file_ext = file.filename.split(".")[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    temp_path = os.path.join(directory, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
     
-    # Save file
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
+    try:
+        async with aiofiles.open(temp_path, 'wb') as out_file:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            file_type = sniff_image_type(chunk)
+            if file_type is None or file_type not in settings.extensions_list:
+                raise UploadValidationError(
+                    f"File type not allowed. Allowed types: {', '.join(settings.extensions_list)}"
+                )
+            
+            while chunk:
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise UploadValidationError(upload_too_large_message(), status_code=413)
+                digest.update(chunk)
+                await out_file.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise
     
-    return unique_filename
+    return SpooledUpload(path=temp_path, size=size, digest=digest.hexdigest(), file_type=file_type)
 
 
-def get_file_path(filename: str) -> str:
-    """Get full path for a filename."""
-    return os.path.join(settings.UPLOAD_DIR, filename)
+def variant_filename(filename: str, variant: str) -> str:
+    """Name of a resized derivative of an upload, e.g. `<stem>.thumb.webp`."""
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}.{variant}.webp"
 
 
-def delete_file(filename: str) -> bool:
-    """Delete a file from uploads directory."""
-    try:
-        file_path = get_file_path(filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-        return False
-    except Exception:
-        return False
+def upload_stem(name: str) -> str:
+    """Stem shared by an upload and its derivatives, e.g. `<stem>` for `<stem>.thumb.webp`."""
+    return name.split(".", 1)[0]
+
+
+def image_urls_version() -> str:
+    """
+    Fingerprint of how image URLs are built: storage backend, base URL and key layout.
+    
+    ETags of responses carrying image_urls include it, since switching
+    storage or layout changes those URLs without touching any document.
+    """
+    return storage.url("0000.jpg")
+
+
+def image_urls(filename: str, variants: Iterable[str]) -> Dict[str, str]:
+    """
+    URLs of an upload and its derivatives.
+    
+    Variants that were never generated, e.g. for uploads that predate
+    them, fall back to the next larger size and finally the original.
+    """
+    urls = {"original": storage.url(filename)}
+    available = set(variants)
+    fallback = urls["original"]
+    for variant in reversed(IMAGE_VARIANTS):
+        if variant in available:
+            fallback = storage.url(variant_filename(filename, variant))
+        urls[variant] = fallback
+    return urls
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from typing import Any, Optional
+from fastapi import Response, status
+from fastapi.encoders import jsonable_encoder
+
+# Suffixes CompressionMiddleware appends to the ETag of a compressed body
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def json_bytes(content: Any) -> bytes:
+    """Serialize content exactly as FastAPI's JSONResponse would."""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def version_etag(*parts: Any) -> str:
+    """
+    Strong ETag from the versions of the documents behind a response,
+    e.g. ids with their updated_at, plus any request parameters that shape it.
+    """
+    return make_etag(repr(parts).encode("utf-8"))
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the same representation after content coding."""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def _identity_etag(etag: str) -> str:
+    etag = etag.removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches etag.
+    
+    Uses the weak comparison required for If-None-Match, so W/ prefixes
+    are ignored, as are the content-coding suffixes added on compression.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (_identity_etag(tag.strip()) for tag in if_none_match.split(","))
+    return _identity_etag(etag) in candidates
+
+
+def check_not_modified(response: Response, etag: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """
+    Set the validators of a per-user response.
+    
+    Returns the 304 to send instead when the client's copy is current, so
+    callers can skip loading and serializing the body.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
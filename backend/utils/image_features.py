@@ -0,0 +1,72 @@
+from typing import Dict, Union
+import numpy as np
+from PIL import Image, ImageOps
+
+# Bump when the features below change, so stale ones can be recomputed
+FEATURE_VERSION = 2
+
+# The difference hash compares HASH_SIZE + 1 columns per row: 64 bits
+HASH_SIZE = 8
+# Bins per RGB channel of the color histogram: 4 ** 3 = 64 bins
+HISTOGRAM_BINS = 4
+# Side of the grayscale thumbnail that captures the image's layout
+LAYOUT_SIZE = 8
+# Images are reduced to this edge before any feature is computed
+WORKING_EDGE = 256
+# Length of the embedding: the histogram followed by the layout
+EMBEDDING_SIZE = HISTOGRAM_BINS ** 3 + LAYOUT_SIZE ** 2
+
+# Number of set bits in every byte value, for Hamming distances between hashes
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def extract_features(image_path: str) -> Dict[str, Union[int, bytes]]:
+    """
+    Compute compact visual features of an image.
+
+    - dhash: 64-bit difference hash; near-identical images differ in few bits
+    - histogram: normalized 64-bin RGB histogram, float16
+    - embedding: unit-length vector of the square-rooted histogram and the
+      mean-centered 8x8 grayscale layout, float16; the dot product of two
+      embeddings is their cosine similarity
+
+    Runs inside an image worker process, so it must stay a module-level function.
+    """
+    with Image.open(image_path) as img:
+        img.draft("RGB", (WORKING_EDGE, WORKING_EDGE))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((WORKING_EDGE, WORKING_EDGE), Image.LANCZOS)
+        gray = img.convert("L")
+
+        pixels = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+        dhash = np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes()
+
+        bins = np.asarray(img, dtype=np.uint8).reshape(-1, 3) // (256 // HISTOGRAM_BINS)
+        index = (bins[:, 0].astype(np.int32) * HISTOGRAM_BINS + bins[:, 1]) * HISTOGRAM_BINS + bins[:, 2]
+        histogram = np.bincount(index, minlength=HISTOGRAM_BINS ** 3).astype(np.float32)
+        histogram /= histogram.sum()
+
+        layout = np.asarray(gray.resize((LAYOUT_SIZE, LAYOUT_SIZE), Image.BOX), dtype=np.float32).ravel()
+        layout -= layout.mean()
+        norm = np.linalg.norm(layout)
+        if norm > 0:
+            layout /= norm
+
+    # The layout of a flat image is all zeros, so normalize the whole vector
+    # rather than relying on both halves having unit length
+    embedding = np.concatenate([np.sqrt(histogram), layout])
+    embedding /= np.linalg.norm(embedding)
+    return {
+        "version": FEATURE_VERSION,
+        "dhash": dhash,
+        "histogram": histogram.astype(np.float16).tobytes(),
+        "embedding": embedding.astype(np.float16).tobytes(),
+    }
+
+
+def hamming_distances(hashes: np.ndarray, dhash: bytes) -> np.ndarray:
+    """Bits differing between dhash and each row of hashes, an (n, 8) uint8 array."""
+    query = np.frombuffer(dhash, dtype=np.uint8)
+    return POPCOUNT[np.bitwise_xor(hashes, query)].sum(axis=1, dtype=np.int32)
@@ -0,0 +1,98 @@
+import io
+import os
+import time
+from typing import Dict, List, Tuple
+from PIL import Image, ImageOps
+from config.settings import settings
+from utils.concurrency import BoundedExecutor
+
+# Image decoding and resizing is CPU-bound, so it runs in worker processes
+# where it neither blocks the event loop nor contends for the GIL
+image_executor = BoundedExecutor(
+    "image",
+    max_in_flight=settings.IMAGE_WORKERS,
+    max_queue=settings.IMAGE_MAX_QUEUE,
+    timeout=settings.IMAGE_TIMEOUT_SECONDS,
+    use_processes=True,
+)
+
+
+def prepare_model_image(image_path: str, max_edge: int, quality: int) -> Tuple[bytes, Dict]:
+    """
+    Build the compact JPEG derivative that is sent to the model.
+
+    Applies EXIF orientation, drops all metadata, downscales so the longest
+    edge is at most max_edge and re-encodes at the given JPEG quality.
+    Runs inside a worker process, so it must stay a module-level function.
+
+    Returns:
+        Tuple of (jpeg_bytes, stats) where stats describes the size reduction
+    """
+    started = time.perf_counter()
+    original_bytes = os.path.getsize(image_path)
+
+    with Image.open(image_path) as img:
+        original_size = img.size
+        # draft() lets the JPEG decoder skip most of the work for large
+        # downscales; it only has an effect before the pixels are loaded
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        # Saving without exif/icc arguments strips the original metadata
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        model_size = img.size
+
+    data = buffer.getvalue()
+    stats = {
+        "original_bytes": original_bytes,
+        "model_bytes": len(data),
+        "original_size": original_size,
+        "model_size": model_size,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return data, stats
+
+
+def make_variants(image_path: str, targets: List[Tuple[str, int]], quality: int) -> Dict:
+    """
+    Write resized WebP derivatives of an image.
+
+    targets is a list of (output_path, max_edge), largest first: the image
+    is decoded once and each derivative is downscaled from the previous one.
+    Like prepare_model_image, this runs inside a worker process.
+
+    Returns:
+        Stats with the original size and the bytes written per derivative
+    """
+    started = time.perf_counter()
+    written = {}
+
+    with Image.open(image_path) as img:
+        img.draft("RGB", (targets[0][1], targets[0][1]))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        for output_path, max_edge in targets:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            temp_path = output_path + ".part"
+            img.save(temp_path, format="WEBP", quality=quality, method=4)
+            os.replace(temp_path, output_path)
+            written[os.path.basename(output_path)] = os.path.getsize(output_path)
+
+    return {
+        "variant_bytes": written,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def variant_edges() -> Dict[str, int]:
+    """Longest edge of each image variant, from settings."""
+    return {
+        "thumb": settings.IMAGE_THUMB_EDGE,
+        "medium": settings.IMAGE_MEDIUM_EDGE,
+    }
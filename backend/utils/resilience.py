@@ -0,0 +1,240 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while its circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when upstream still fails with a retryable error after every attempt."""
+
+
+def is_retryable(e: BaseException) -> bool:
+    """
+    Whether an upstream error is transient.
+
+    Google API errors carry their HTTP status as `code`; connection
+    errors and plain timeouts are retried as well.
+    """
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(e, "code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after failure_threshold consecutive upstream failures.
+
+    Once open, calls are rejected for reset_seconds. A single probe call is
+    then let through: its success closes the circuit, its failure opens it
+    again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == CIRCUIT_CLOSED:
+            return
+        retry_after = self._opened_at + self.reset_seconds - time.monotonic()
+        if self.state == CIRCUIT_OPEN and retry_after <= 0:
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, max(retry_after, 1.0))
+
+    def record_success(self) -> None:
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self.opened += 1
+            self.state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def record_other(self) -> None:
+        """Finish a call that failed for reasons unrelated to upstream health."""
+        self._probing = False
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls, for percentile estimates."""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    Retries, circuit breaking and optional hedging around an upstream call.
+
+    Retryable errors (see is_retryable) are retried up to max_attempts
+    times with full-jitter exponential backoff; when they persist the call
+    raises UpstreamUnavailableError. Retryable errors and timeouts count
+    against the circuit breaker, whose open state fails calls with
+    CircuitOpenError without touching upstream.
+
+    With hedging enabled, an attempt still running after the p95 latency of
+    recent calls (never less than hedge_min_delay) gets a second, identical
+    attempt, and whichever succeeds first wins. Only use it for idempotent
+    calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        breaker: CircuitBreaker,
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+        failure: Callable[[BaseException], bool] = is_retryable,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker(latency_window)
+        self.retryable = retryable
+        self.failure = failure
+        self.sleep = sleep
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged attempt, or None when hedging is off or not calibrated yet."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        # Hedging a struggling upstream would only add to its load
+        if self.breaker.state != CIRCUIT_CLOSED:
+            return None
+        return max(self.latency.percentile(0.95), self.hedge_min_delay)
+
+    async def _timed(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        result = await attempt()
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _attempt(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(attempt)
+
+        primary = asyncio.ensure_future(self._timed(attempt))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedged += 1
+                pending.add(asyncio.ensure_future(self._timed(attempt)))
+            # Wait for the first success; fail only once every attempt has failed
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """Run attempt(), a factory for a fresh upstream call, under the policy."""
+        for number in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = await self._attempt(attempt)
+            except Exception as e:
+                if self.failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_other()
+                if not self.retryable(e):
+                    raise
+                if number == self.max_attempts:
+                    raise UpstreamUnavailableError(f"{self.name} failed after {number} attempts: {e}") from e
+                self.retries += 1
+                backoff = min(self.max_delay, self.base_delay * 2 ** (number - 1))
+                print(f"{self.name} attempt {number} failed, retrying: {e}")
+                await self.sleep(random.uniform(0, backoff))
+                continue
+            except BaseException:
+                # A cancelled call says nothing about upstream, but must not
+                # keep holding the half-open probe
+                self.breaker.record_other()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return breaker state, retry and hedging counters and the recent p95 latency."""
+        p95 = self.latency.percentile(0.95)
+        return {
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "short_circuited": self.breaker.rejected,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
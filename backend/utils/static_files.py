@@ -0,0 +1,19 @@
+from starlette.staticfiles import StaticFiles
+from storage.base import IMMUTABLE_CACHE_CONTROL
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for uploads, which are never rewritten under the same name.
+    
+    Upload keys are content hashes, so browsers and CDNs may keep them for a
+    year without revalidating.
+    """
+
+    cache_control = IMMUTABLE_CACHE_CONTROL
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+        return response
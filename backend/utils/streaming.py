@@ -0,0 +1,28 @@
+from typing import AsyncIterator
+
+
+class LineTooLongError(ValueError):
+    """Raised when a streamed line exceeds the allowed length."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Split a stream of byte chunks into lines, without the line endings.
+
+    Only the current partial line is buffered, so arbitrarily large bodies
+    are read in constant memory. Raises LineTooLongError once a line grows
+    past max_line_bytes.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if len(line) > max_line_bytes:
+                raise LineTooLongError(f"Line longer than {max_line_bytes} bytes")
+            yield line.rstrip(b"\r")
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer.rstrip(b"\r")
@@ -0,0 +1,154 @@
+import re
+from typing import Any, List, Tuple, Type
+import orjson
+from pydantic import BaseModel
+
+# Schema keywords the Gemini response_schema accepts (an OpenAPI 3.0 subset)
+SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+# Python literals models sometimes emit instead of JSON ones
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_WORD = re.compile(r"[A-Za-z_]+")
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+class OutputParseError(ValueError):
+    """Raised when model output cannot be parsed as JSON, even after repair."""
+
+
+def response_schema(model: Type[BaseModel]) -> dict:
+    """
+    Convert a Pydantic model's JSON schema into a Gemini response_schema.
+
+    References are inlined, Optional fields become `nullable` and keywords
+    the API rejects (titles, defaults, ...) are dropped.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            return convert(definitions[node["$ref"].rsplit("/", 1)[-1]])
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            converted = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                converted["nullable"] = True
+            if "description" in node:
+                converted["description"] = node["description"]
+            return converted
+
+        converted = {}
+        for key, value in node.items():
+            if key == "properties":
+                converted[key] = {name: convert(child) for name, child in value.items()}
+            elif key == "items":
+                converted[key] = convert(value)
+            elif key in SCHEMA_KEYS:
+                converted[key] = value
+        return converted
+
+    return convert(schema)
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix of almost-JSON produced by a model.
+
+    Drops prose around the outermost object, trailing commas and raw
+    newlines inside strings, replaces Python literals, and closes strings,
+    objects and arrays left open by a truncated response. The result may
+    still be invalid; callers must parse it.
+    """
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = escaped = False
+    string_start = -1
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            string_start = len(out)
+            out.append(ch)
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if closers:
+                out.append(closers.pop())
+            if not closers:
+                # Anything after the outermost value is prose
+                break
+        elif ch.isascii() and ch.isalpha():
+            # Other letters are left for the parser to accept or reject
+            word = _WORD.match(text, i).group()
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if not closers:
+        return "".join(out)
+
+    # Truncated output: finish the open string, then the open containers
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    if out and out[-1] == ":":
+        out.append("null")
+    elif closers[-1] == "}" and out and out[-1] == '"':
+        # A key without a value
+        before = "".join(out[:string_start]).rstrip()
+        if before.endswith(("{", ",")):
+            out.append(":null")
+    while closers:
+        _drop_trailing_comma(out)
+        out.append(closers.pop())
+    return "".join(out)
+
+
+def parse_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse model output as JSON, repairing it if needed.
+
+    Returns the parsed value and whether it had to be repaired. Raises
+    OutputParseError if it cannot be salvaged.
+    """
+    text = _FENCE.sub("", text.strip())
+    try:
+        return orjson.loads(text), False
+    except orjson.JSONDecodeError:
+        pass
+    try:
+        return orjson.loads(repair_json(text)), True
+    except Exception as e:
+        # Repair is best effort; however it fails, the output is unusable
+        raise OutputParseError(str(e)) from e
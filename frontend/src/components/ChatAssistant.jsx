@@ -36,12 +36,22 @@ const ChatAssistant = ({ analysisId }) => {
                 .filter(m => m.role !== 'system') // filter out specific system messages if any
                 .map(m => ({ role: m.role, content: m.content }));
 
-            const response = await outfitAPI.chatWithStylist(analysisId, {
+            let started = false;
+            await outfitAPI.streamChatWithStylist(analysisId, {
                 message: userMessage.content,
                 history: historyToSend
+            }, (chunk) => {
+                if (!started) {
+                    // Show the reply as soon as the first chunk arrives
+                    started = true;
+                    setMessages(prev => [...prev, { role: 'assistant', content: chunk }]);
+                    return;
+                }
+                setMessages(prev => {
+                    const last = prev[prev.length - 1];
+                    return [...prev.slice(0, -1), { ...last, content: last.content + chunk }];
+                });
             });
-
-            setMessages(prev => [...prev, { role: 'assistant', content: response.data.message }]);
         } catch (err) {
             toast.error('Failed to get response');
         } finally {
@@ -108,7 +118,7 @@ const ChatAssistant = ({ analysisId }) => {
                                 </div>
                             </div>
                         ))}
-                        {loading && (
+                        {loading && messages[messages.length - 1]?.role === 'user' && (
                             <div className="flex justify-start">
                                 <div className="bg-white border border-gray-200 rounded-2xl p-3 shadow-sm rounded-bl-none">
                                     <div className="flex space-x-1">
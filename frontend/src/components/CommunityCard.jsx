@@ -1,21 +1,31 @@
 import React, { useState } from 'react';
 import { Heart, MessageCircle, Share2, User, ThumbsDown } from 'lucide-react';
-import { outfitAPI } from '../services/api';
+import { imageUrl, outfitAPI } from '../services/api';
 import { toast } from 'react-hot-toast';
 import { useAuth } from '../context/AuthContext';
 
 const CommunityCard = ({ analysis }) => {
     const { user } = useAuth();
-    const [liked, setLiked] = useState(analysis.likes?.includes(user?.id) || false);
-    const [disliked, setDisliked] = useState(analysis.dislikes?.includes(user?.id) || false);
-    const [likesCount, setLikesCount] = useState(analysis.likes?.length || 0);
-    const [dislikesCount, setDislikesCount] = useState(analysis.dislikes?.length || 0);
+    const [liked, setLiked] = useState(analysis.liked_by_me || false);
+    const [disliked, setDisliked] = useState(analysis.disliked_by_me || false);
+    const [likesCount, setLikesCount] = useState(analysis.like_count || 0);
+    const [dislikesCount, setDislikesCount] = useState(analysis.dislike_count || 0);
 
     const [showComments, setShowComments] = useState(false);
-    const [comments, setComments] = useState(analysis.comments || []);
+    // Feed items only carry the count; the thread is loaded on first open
+    const [comments, setComments] = useState(null);
+    const [commentCount, setCommentCount] = useState(analysis.comment_count || 0);
+    const [olderCursor, setOlderCursor] = useState(null);
     const [newComment, setNewComment] = useState('');
 
-    const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+    // The server returns the authoritative state, which also picks up
+    // reactions from other users since the feed was loaded
+    const syncReactions = (data) => {
+        setLiked(data.liked);
+        setDisliked(data.disliked);
+        setLikesCount(data.like_count);
+        setDislikesCount(data.dislike_count);
+    };
 
     const handleLike = async () => {
         // Optimistic update
@@ -31,7 +41,8 @@ const CommunityCard = ({ analysis }) => {
         }
 
         try {
-            await outfitAPI.toggleLike(analysis._id);
+            const { data } = await outfitAPI.toggleLike(analysis._id);
+            syncReactions(data);
         } catch (err) {
             // Revert
             setLiked(wasLiked);
@@ -58,7 +69,8 @@ const CommunityCard = ({ analysis }) => {
         }
 
         try {
-            await outfitAPI.toggleDislike(analysis._id);
+            const { data } = await outfitAPI.toggleDislike(analysis._id);
+            syncReactions(data);
         } catch (err) {
             // Revert
             setDisliked(wasDisliked);
@@ -71,17 +83,35 @@ const CommunityCard = ({ analysis }) => {
         }
     };
 
+    // Pages arrive newest first; the thread is shown oldest first
+    const loadComments = async (cursor = null) => {
+        try {
+            const response = await outfitAPI.getComments(analysis._id, cursor);
+            const page = [...response.data.data].reverse();
+            setComments(prev => cursor ? [...page, ...(prev || [])] : page);
+            setOlderCursor(response.data.next_cursor);
+        } catch (err) {
+            setComments(prev => prev || []);
+            toast.error('Failed to load comments');
+        }
+    };
+
+    const toggleComments = () => {
+        const opening = !showComments;
+        setShowComments(opening);
+        if (opening && comments === null) loadComments();
+    };
+
     const handleComment = async (e) => {
         e.preventDefault();
         if (!newComment.trim()) return;
 
         try {
             const response = await outfitAPI.addComment(analysis._id, newComment);
-            if (response && response.data && response.data.data) {
-                setComments([...comments, response.data.data]);
-            } else {
-                setComments([...comments, { text: newComment, username: user?.username || 'You', created_at: new Date().toISOString() }]);
-            }
+            const added = (response && response.data && response.data.data)
+                || { text: newComment, username: user?.username || 'You', created_at: new Date().toISOString() };
+            setComments([...(comments || []), added]);
+            setCommentCount(prev => prev + 1);
             setNewComment('');
             toast.success('Comment added!');
         } catch (err) {
@@ -93,12 +123,14 @@ const CommunityCard = ({ analysis }) => {
         <div className="bg-white rounded-xl shadow-sm border border-gray-200 overflow-hidden hover:shadow-md transition-shadow">
             <div className="relative aspect-[4/5] overflow-hidden bg-gray-100">
                 <img
-                    src={`${API_URL}/uploads/${analysis.image_filename}`}
+                    src={imageUrl(analysis.image_urls.thumb)}
+                    srcSet={`${imageUrl(analysis.image_urls.thumb)} 1x, ${imageUrl(analysis.image_urls.medium)} 2x`}
+                    loading="lazy"
                     alt="Outfit"
                     className="w-full h-full object-cover transform hover:scale-105 transition-transform duration-500"
                 />
                 <div className="absolute top-2 right-2 bg-black/50 text-white text-xs px-2 py-1 rounded-full backdrop-blur-sm">
-                    {analysis.analysis_result.outfit_rating.score}/10
+                    {analysis.score}/10
                 </div>
                 {analysis.tags && analysis.tags.length > 0 && (
                     <div className="absolute bottom-2 left-2 flex flex-wrap gap-1">
@@ -114,7 +146,7 @@ const CommunityCard = ({ analysis }) => {
             <div className="p-4">
                 <div className="mb-3">
                     <p className="text-gray-800 line-clamp-2 text-sm">
-                        {analysis.analysis_result.style_description}
+                        {analysis.style_description}
                     </p>
                 </div>
 
@@ -138,24 +170,33 @@ const CommunityCard = ({ analysis }) => {
                     </div>
 
                     <button
-                        onClick={() => setShowComments(!showComments)}
+                        onClick={toggleComments}
                         className="flex items-center space-x-1 text-gray-500 hover:text-indigo-600"
                     >
                         <MessageCircle size={20} />
-                        <span className="text-sm font-medium">{comments.length}</span>
+                        <span className="text-sm font-medium">{commentCount}</span>
                     </button>
                 </div>
 
                 {showComments && (
                     <div className="mt-4 border-t border-gray-100 pt-3">
                         <div className="space-y-3 max-h-48 overflow-y-auto mb-3">
-                            {comments.map((comment, idx) => (
-                                <div key={idx} className="text-sm">
+                            {olderCursor && (
+                                <button
+                                    onClick={() => loadComments(olderCursor)}
+                                    className="text-xs text-indigo-600 hover:underline"
+                                >
+                                    Load earlier comments
+                                </button>
+                            )}
+                            {comments === null && <p className="text-xs text-gray-400 italic">Loading comments...</p>}
+                            {comments?.map((comment, idx) => (
+                                <div key={comment._id || idx} className="text-sm">
                                     <span className="font-semibold text-gray-900 mr-2">{comment.username}</span>
                                     <span className="text-gray-700">{comment.text}</span>
                                 </div>
                             ))}
-                            {comments.length === 0 && <p className="text-xs text-gray-400 italic">No comments yet.</p>}
+                            {comments?.length === 0 && <p className="text-xs text-gray-400 italic">No comments yet.</p>}
                         </div>
                         <form onSubmit={handleComment} className="flex gap-2">
                             <input
@@ -1,6 +1,7 @@
 import React from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Star, Calendar, Trash2 } from 'lucide-react';
+import { imageUrl } from '../services/api';
 
 const OutfitCard = ({ analysis, onDelete }) => {
   const navigate = useNavigate();
@@ -21,12 +22,16 @@ const OutfitCard = ({ analysis, onDelete }) => {
     return date.toLocaleDateString('en-US', { year: 'numeric', month: 'short', day: 'numeric' });
   };
 
-  const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-
   return (
     <div onClick={handleClick} className="card cursor-pointer hover:shadow-xl transition-shadow duration-200">
       <div className="relative pb-48 mb-4">
-        <img src={`${API_URL}/uploads/${analysis.image_filename}`} alt="Outfit" className="absolute h-full w-full object-cover rounded-lg" />
+        <img
+          src={imageUrl(analysis.image_urls.thumb)}
+          srcSet={`${imageUrl(analysis.image_urls.thumb)} 1x, ${imageUrl(analysis.image_urls.medium)} 2x`}
+          loading="lazy"
+          alt="Outfit"
+          className="absolute h-full w-full object-cover rounded-lg"
+        />
       </div>
       <div className="flex items-center justify-between mb-3">
         <div className="flex items-center space-x-2">
@@ -3,7 +3,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import AnalysisResult from '../components/AnalysisResult';
 import ChatAssistant from '../components/ChatAssistant';
-import { outfitAPI } from '../services/api';
+import { imageUrl, outfitAPI } from '../services/api';
 import { ArrowLeft, Loader, Volume2, Globe } from 'lucide-react';
 import { toast } from 'react-hot-toast';
 
@@ -86,8 +86,6 @@ const AnalysisDetail = () => {
     );
   }
 
-  const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-
   return (
     <div className="min-h-screen py-12 px-4">
       <div className="max-w-7xl mx-auto">
@@ -104,7 +102,7 @@ const AnalysisDetail = () => {
             <div className="card sticky top-6">
               <h3 className="text-lg font-semibold mb-3 text-gray-800">Your Outfit</h3>
               <img
-                src={`${API_URL}/uploads/${analysis.image_filename}`}
+                src={imageUrl(analysis.image_urls.medium)}
                 alt="Outfit"
                 className="w-full h-auto rounded-lg mb-4"
               />
@@ -6,6 +6,10 @@ import { toast } from 'react-hot-toast';
 const Closet = () => {
     const [items, setItems] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [filters, setFilters] = useState({ query: '', category: '', color: '' });
+    const [facets, setFacets] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [showModal, setShowModal] = useState(false);
     const [newItem, setNewItem] = useState({
         name: '',
@@ -17,17 +21,38 @@ const Closet = () => {
     const [isSubmitting, setIsSubmitting] = useState(false);
 
     useEffect(() => {
-        fetchCloset();
+        // Wait for typing in the search and color filters to settle before querying
+        const timer = setTimeout(() => fetchCloset(), 300);
+        return () => clearTimeout(timer);
+    }, [filters]);
+
+    useEffect(() => {
+        fetchFacets();
     }, []);
 
-    const fetchCloset = async () => {
+    const fetchFacets = async () => {
+        try {
+            const response = await closetAPI.getFacets();
+            setFacets(response.data);
+        } catch (err) {
+            // Counts are optional; the filters work without them
+        }
+    };
+
+    const fetchCloset = async (cursor = null) => {
+        if (cursor) setLoadingMore(true);
         try {
-            const response = await closetAPI.getCloset();
-            setItems(response.data);
+            const query = filters.query.trim();
+            const response = query
+                ? await closetAPI.searchCloset(query)
+                : await closetAPI.getCloset(filters, cursor);
+            setItems(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (err) {
             toast.error('Failed to load closet items');
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     };
 
@@ -46,6 +71,7 @@ const Closet = () => {
         try {
             const response = await closetAPI.addItem(itemData);
             setItems([response.data, ...items]);
+            fetchFacets();
             setShowModal(false);
             setNewItem({ name: '', category: 'top', color: '', description: '', tags: '' });
             toast.success('Item added to closet!');
@@ -61,6 +87,7 @@ const Closet = () => {
         try {
             await closetAPI.deleteItem(id);
             setItems(items.filter(item => item._id !== id));
+            fetchFacets();
             toast.success('Item removed');
         } catch (err) {
             toast.error('Failed to delete item');
@@ -68,6 +95,7 @@ const Closet = () => {
     };
 
     const categories = ['top', 'bottom', 'shoes', 'accessory', 'outerwear', 'dress', 'other'];
+    const categoryCounts = Object.fromEntries((facets?.categories || []).map(f => [f.value, f.count]));
 
     if (loading) {
         return (
@@ -94,7 +122,50 @@ const Closet = () => {
                     </button>
                 </div>
 
-                {items.length === 0 ? (
+                <div className="flex flex-wrap gap-4 mb-6">
+                    <input
+                        type="search"
+                        className="input-field flex-1 min-w-[12rem]"
+                        placeholder="Search your closet, e.g. navy wool"
+                        value={filters.query}
+                        onChange={e => setFilters({ ...filters, query: e.target.value })}
+                    />
+                    {!filters.query.trim() && (
+                        <>
+                            <select
+                                className="input-field w-auto capitalize"
+                                value={filters.category}
+                                onChange={e => setFilters({ ...filters, category: e.target.value })}
+                            >
+                                <option value="">All categories{facets ? ` (${facets.total})` : ''}</option>
+                                {categories.map(c => (
+                                    <option key={c} value={c} className="capitalize">
+                                        {c}{facets ? ` (${categoryCounts[c] || 0})` : ''}
+                                    </option>
+                                ))}
+                            </select>
+                            <input
+                                type="text"
+                                className="input-field w-auto"
+                                placeholder="Filter by color"
+                                list="closet-colors"
+                                value={filters.color}
+                                onChange={e => setFilters({ ...filters, color: e.target.value })}
+                            />
+                            <datalist id="closet-colors">
+                                {(facets?.colors || []).map(f => (
+                                    <option key={f.value} value={f.value}>{`${f.value} (${f.count})`}</option>
+                                ))}
+                            </datalist>
+                        </>
+                    )}
+                </div>
+
+                {items.length === 0 && (filters.query.trim() || filters.category || filters.color) ? (
+                    <div className="text-center py-16 card">
+                        <p className="text-gray-600">No items match these filters.</p>
+                    </div>
+                ) : items.length === 0 ? (
                     <div className="text-center py-16 card">
                         <Tag className="mx-auto text-gray-400 mb-4" size={64} />
                         <h3 className="text-2xl font-semibold text-gray-900 mb-2">Closet is empty</h3>
@@ -134,6 +205,18 @@ const Closet = () => {
                     </div>
                 )}
 
+                {nextCursor && (
+                    <div className="text-center mt-8">
+                        <button
+                            onClick={() => fetchCloset(nextCursor)}
+                            disabled={loadingMore}
+                            className="btn-secondary"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
+
                 {/* Add Item Modal */}
                 {showModal && (
                     <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center p-4 z-50">
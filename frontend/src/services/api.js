@@ -2,6 +2,9 @@ import axios from 'axios';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// Image URLs are relative to the API unless the storage backend serves them itself (e.g. S3 or a CDN)
+export const imageUrl = (path) => (/^https?:\/\//.test(path) ? path : `${API_URL}${path}`);
+
 const api = axios.create({
   baseURL: API_URL,
   headers: {
@@ -46,6 +49,41 @@ export const outfitAPI = {
   },
   getAnalysis: (id) => api.get(`/api/outfit/${id}`),
   chatWithStylist: (id, data) => api.post(`/api/outfit/chat/${id}`, data),
+  // Streams the stylist reply over SSE, calling onChunk with each piece of text
+  streamChatWithStylist: async (id, data, onChunk) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_URL}/api/outfit/chat/${id}/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token && { Authorization: `Bearer ${token}` }),
+      },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok) {
+      throw new Error(`Chat request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const event of events) {
+        const lines = event.split('\n');
+        const type = lines.find((line) => line.startsWith('event: '))?.slice(7) || 'message';
+        const dataLine = lines.find((line) => line.startsWith('data: '));
+        if (!dataLine) continue;
+        const payload = JSON.parse(dataLine.slice(6));
+        if (type === 'error') throw new Error(payload.detail);
+        if (type === 'message') onChunk(payload.text);
+      }
+    }
+  },
 
   // Community features
   getCommunityFeed: (limit = 50, skip = 0) => api.get(`/api/outfit/community/feed?limit=${limit}&skip=${skip}`),
@@ -53,6 +91,9 @@ export const outfitAPI = {
   toggleLike: (id) => api.post(`/api/outfit/${id}/like`),
   toggleDislike: (id) => api.post(`/api/outfit/${id}/dislike`),
   addComment: (id, text) => api.post(`/api/outfit/${id}/comment`, { text }),
+  // Newest first; pass the previous page's next_cursor to get older comments
+  getComments: (id, cursor = null, limit = 20) =>
+    api.get(`/api/outfit/${id}/comments?limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
 
   getUserAnalyses: (limit = 50, skip = 0) =>
     api.get(`/api/outfit/user/all?limit=${limit}&skip=${skip}`),
@@ -60,7 +101,20 @@ export const outfitAPI = {
 };
 
 export const closetAPI = {
-  getCloset: () => api.get('/api/closet/'),
+  // Newest first, with only the fields the grid shows; pass the previous page's
+  // next_cursor to get the next page
+  getCloset: ({ category, color, tags = [] } = {}, cursor = null, limit = 48) => {
+    const params = new URLSearchParams({ limit, view: 'grid' });
+    if (category) params.append('category', category);
+    if (color?.trim()) params.append('color', color.trim());
+    tags.forEach(tag => params.append('tags', tag));
+    if (cursor) params.append('cursor', cursor);
+    return api.get(`/api/closet/?${params}`);
+  },
+  // Best matches first across item names, descriptions and tags
+  searchCloset: (q, limit = 48) =>
+    api.get(`/api/closet/search?${new URLSearchParams({ q, limit, view: 'grid' })}`),
+  getFacets: () => api.get('/api/closet/facets'),
   addItem: (data) => api.post('/api/closet/', data),
   deleteItem: (id) => api.delete(`/api/closet/${id}`),
   updateItem: (id, data) => api.patch(`/api/closet/${id}`, data),